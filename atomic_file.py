@@ -0,0 +1,31 @@
+import os
+import json
+import threading
+
+
+def write(path, data):
+    """
+    Writes data to a temporary file next to path and renames it over path, so a crash never leaves a partial file
+    The temporary file is unique per process and thread, concurrent writers of the same path never share it
+    :param path: destination file
+    :param data: bytes, or str written as utf-8
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json(path, obj, **dump_kwargs):
+    """
+    Saves obj as json to path atomically (see write)
+    :param dump_kwargs: arguments of json.dumps, e.g. sort_keys=True
+    """
+    write(path, json.dumps(obj, **dump_kwargs))
@@ -0,0 +1,114 @@
+# benchmark of the players bio processing at 75-season scale (75 seasons of 500 players): normalize_bio_frame
+# against the row-wise df.apply conversions it replaced, and combine_seasons against the concat loop it replaced
+# (both copied below, unchanged, with the converters they used)
+# usage: python benchmarks/bio_normalization.py [seasons], no browser or network is needed
+import os
+import sys
+import random
+import logging
+import timeit
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import web_scraping_players_info
+
+SEASONS = 75
+PLAYERS_PER_SEASON = 500
+REPEAT = 5
+
+
+def convert_feet_inches_to_cm(feet_inches):
+    """ Converts str(feet-inches) to cm"""
+    try:
+        feet, inches = feet_inches.split('-')
+        return int(feet) * config.FEET_TO_CM + int(inches) * config.INCHES_TO_CM
+    except ValueError:
+        logging.error(f'ValueError occurred when trying to convert {feet_inches} to cm')
+        return ''
+    except TypeError:
+        logging.error(f'TypeError occurred when trying to convert {feet_inches} to cm')
+        return ''
+
+
+def convert_pounds_to_kg(pounds):
+    """ Converts pounds to cm"""
+    try:
+        return pounds * config.POUNDS_TO_KG
+    except ValueError:
+        logging.error(f'ValueError occurred when trying to convert {pounds} to kg')
+        return ''
+    except TypeError:
+        logging.error(f'TypeError occurred when trying to convert {pounds} to kg')
+        return ''
+
+
+def normalize_with_apply(df):
+    """ Converts the heights and weights as get_nba_players_data did before normalize_bio_frame """
+    df['height'] = df.apply(lambda x: convert_feet_inches_to_cm(x['height']), axis=1)
+    df['weight'] = df.apply(lambda x: convert_pounds_to_kg(x['weight']), axis=1)
+    return df
+
+
+def combine_with_loop(seasons_info):
+    """ Combines the seasons as collect_players_info did before combine_seasons, one concat per season """
+    create_dfs = True
+    for season_info in seasons_info:
+        if create_dfs:
+            df_nba_players_info, df_ids = season_info
+            create_dfs = False
+        else:
+            tmp_df_nba_players_info, tmp_df_ids = season_info
+            df_nba_players_info = pd.concat([df_nba_players_info, tmp_df_nba_players_info])
+            df_ids = pd.concat([df_ids, tmp_df_ids])
+            df_nba_players_info = df_nba_players_info.drop_duplicates('player_id', keep='last')
+            df_ids = df_ids.drop_duplicates('player_id', keep='last')
+    return df_nba_players_info, df_ids
+
+
+def synthetic_season(season, players=PLAYERS_PER_SEASON):
+    """ Returns the players details and ids of a season as get_nba_players_data returns them before conversion """
+    random.seed(season)
+    ids = [f'player{random.randrange(players * 4):05d}' for _ in range(players)]
+    info = pd.DataFrame({'player_id': ids,
+                         'team': [random.choice(['LAL', 'BOS', 'MIA']) for _ in ids],
+                         'age': [random.randint(19, 40) for _ in ids],
+                         'height': [f'{random.randint(5, 7)}-{random.randint(0, 11)}' for _ in ids],
+                         'weight': [random.randint(160, 300) for _ in ids],
+                         'college': ['None'] * players,
+                         'country': ['USA'] * players,
+                         'draft_year': [random.choice([str(season - 3), 'Undrafted']) for _ in ids],
+                         'draft_round': [random.choice(['1', '2', 'Undrafted']) for _ in ids],
+                         'draft_number': [str(random.randint(1, 60)) for _ in ids]})
+    return info, pd.DataFrame({'player_id': ids, 'player': [f'Name {player_id}' for player_id in ids]})
+
+
+def best_time(func, setup):
+    """ Returns the best time of REPEAT runs of func(setup()), setup is not timed """
+    times = []
+    for _ in range(REPEAT):
+        argument = setup()
+        times.append(timeit.timeit(lambda: func(argument), number=1))
+    return min(times)
+
+
+if __name__ == '__main__':
+    seasons = int(sys.argv[1]) if len(sys.argv) > 1 else SEASONS
+    seasons_info = [synthetic_season(season) for season in range(2023 - seasons, 2023)]
+    all_rows = pd.concat([info for info, ids in seasons_info], ignore_index=True)
+
+    old = normalize_with_apply(all_rows.copy())
+    new = web_scraping_players_info.normalize_bio_frame(all_rows.copy())
+    # both versions give the same heights, weights and combined rows
+    for col in ['height', 'weight']:
+        pd.testing.assert_series_equal(old[col], new[col])
+    for old_df, new_df in zip(combine_with_loop(seasons_info), web_scraping_players_info.combine_seasons(seasons_info)):
+        pd.testing.assert_frame_equal(old_df.reset_index(drop=True), new_df.reset_index(drop=True))
+
+    print(f'{len(all_rows)} rows, {seasons} seasons, best of {REPEAT}')
+    for name, func, setup in [('apply', normalize_with_apply, all_rows.copy),
+                              ('normalize_bio_frame', web_scraping_players_info.normalize_bio_frame, all_rows.copy),
+                              ('concat loop', combine_with_loop, lambda: seasons_info),
+                              ('combine_seasons', web_scraping_players_info.combine_seasons, lambda: seasons_info)]:
+        print(f'{name:>20}: {best_time(func, setup) * 1000:8.1f} ms')
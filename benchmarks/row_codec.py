@@ -0,0 +1,75 @@
+# benchmark of the csv row encoding of the loaders: the codec compiled from the table DDL (compile_row_codec)
+# against generate_row, the per-row encoder it replaced (copied below, unchanged, with the constants it used)
+# usage: python benchmarks/row_codec.py [rows], no database is needed, only the encoding is timed
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema
+import to_database_tables
+
+STATS_OMITED_COLUMNS = ['', 'player', 'age']
+STATS_VARCHAR_COLUMNS = ['player_id', 'pos', 'team_id']
+ROWS = 20000
+REPEAT = 5
+
+
+def generate_row(row_data, varchar_cols=[], omited_cols=[]):
+    """
+    :param row_data: dictionary with the data from one row of the csv file
+    :param varchar_cols: cols of type varchar
+    :param omited_cols: cols that will not be saved
+    :return: a list with the data of one row in the csv file
+    """
+    row_data_list = []
+    # creating a list for each row by its value type
+    for key in row_data:
+        if key in omited_cols:
+            pass
+        elif key in varchar_cols:
+            row_data_list.append(row_data[key])
+        elif row_data[key] == '' or row_data[key] == 'Undrafted':
+            row_data_list.append(None)
+        else:
+            row_data_list.append(float(row_data[key]))
+    return row_data_list
+
+
+def generate_rows(rows, year):
+    """ Encodes the rows as load_stats_rows did before the codec: generate_row then the season inserted """
+    tup_list = []
+    for player_data in rows:
+        row_data = generate_row(player_data, varchar_cols=STATS_VARCHAR_COLUMNS, omited_cols=STATS_OMITED_COLUMNS)
+        row_data.insert(3, year)
+        tup_list.append(tuple(row_data))
+    return tup_list
+
+
+def synthetic_rows(count, table_name='stats_per_game'):
+    """ Returns csv row dicts of a stats table as the scraper writes them (strings, some empty percentages) """
+    random.seed(0)
+    stats = [name for name, sql_type in schema.table_columns(schema.STATS_TABLES_DDL[table_name])
+             if name not in ('player_id', 'pos', 'team_season', 'season')]
+    rows = []
+    for index in range(count):
+        row = {'player_id': f'player{index:05d}', 'player': f'Player {index}', 'pos': random.choice('CFG'),
+               'age': str(random.randint(19, 40)), 'team_id': random.choice(['LAL', 'BOS', 'TOT'])}
+        row.update({stat: '' if stat.endswith('_pct') and random.random() < 0.05 else f'{random.uniform(0, 40):.3f}'
+                    for stat in stats})
+        rows.append(row)
+    return rows
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    rows = synthetic_rows(count)
+    assert generate_rows(rows, 2021) == to_database_tables.encode_rows(rows, 'stats_per_game', {'season': 2021})
+
+    for name, encode in [('generate_row', lambda: generate_rows(rows, 2021)),
+                         ('compile_row_codec', lambda: to_database_tables.encode_rows(rows, 'stats_per_game',
+                                                                                      {'season': 2021}))]:
+        best = min(timeit.repeat(encode, number=1, repeat=REPEAT))
+        print(f'{name:>18}: {best * 1000:7.1f} ms for {count} rows ({count / best:,.0f} rows/s), best of {REPEAT}')
@@ -0,0 +1,139 @@
+# benchmark of the stats tables keys and indexes: lookups by season, team, position and player on a synthetic
+# 75-season stats_totals table, with the indexes used and with a full table scan forced
+# on MySQL (the backend the indexes and the partitioning are designed for) the queries run again once the table is
+# partitioned by season (STATS_PARTITION_BY_SEASON), the scans then only read the partitions of the seasons queried
+# usage: python benchmarks/stats_indexes.py [mysql|sqlite] [runs per query], the backend defaults to config.DB_BACKEND
+# the data is loaded to a scratch database (BENCHMARK_DATABASE on MySQL, a temporary file on SQLite) dropped at the end
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import db_pool
+import db_backend
+import schema
+import build_database
+
+BENCHMARK_DATABASE = 'nba_data_benchmark'
+SEASONS = range(1948, 2023)
+PLAYERS_PER_SEASON = 600
+TRADED_PER_SEASON = 60
+PLAYERS = len(SEASONS) * PLAYERS_PER_SEASON // 10
+TEAMS = ['ATL', 'BOS', 'BRK', 'CHI', 'CHO', 'CLE', 'DAL', 'DEN', 'DET', 'GSW', 'HOU', 'IND', 'LAC', 'LAL', 'MEM',
+         'MIA', 'MIL', 'MIN', 'NOP', 'NYK', 'OKC', 'ORL', 'PHI', 'PHO', 'POR', 'SAC', 'SAS', 'TOR', 'UTA', 'WAS']
+POSITIONS = ['PG', 'SG', 'SF', 'PF', 'C']
+RUNS = 50
+
+
+def team_decade():
+    start = random.choice(SEASONS[:-9])
+    return random.choice(TEAMS), start, start + 9
+
+
+# (name, where clause, function returning random parameters)
+QUERIES = [('season + team', 'season = %s AND team_season = %s',
+            lambda: (random.choice(SEASONS), random.choice(TEAMS))),
+           ('team over a decade', 'team_season = %s AND season BETWEEN %s AND %s', team_decade),
+           ('position + season', 'pos = %s AND season = %s',
+            lambda: (random.choice(POSITIONS), random.choice(SEASONS))),
+           ('one player', 'player_id = %s', lambda: (f'player{random.randrange(PLAYERS):05d}',))]
+
+
+def synthetic_rows():
+    """
+    Returns the players and stats_totals rows: each season has PLAYERS_PER_SEASON players, the traded ones
+    have a row per team and a TOT row
+    """
+    random.seed(0)
+    players = [(f'player{index:05d}', f'Player {index}') for index in range(PLAYERS)]
+    stat_columns = len(schema.table_columns(schema.STATS_TOTALS_DDL)) - 4
+    stats = []
+    for season in SEASONS:
+        season_players = random.sample(players, PLAYERS_PER_SEASON)
+        for number, (player_id, name) in enumerate(season_players):
+            teams = random.sample(TEAMS, 2) + ['TOT'] if number < TRADED_PER_SEASON else [random.choice(TEAMS)]
+            position = random.choice(POSITIONS)
+            for team in teams:
+                stats.append((player_id, position, team, season) +
+                             tuple(round(random.uniform(0, 80), 3) for _ in range(stat_columns)))
+    return players, stats
+
+
+def insert(connection, table_name, rows, chunk_size=5000):
+    """ Inserts the rows to a table in chunks of chunk_size rows """
+    key_columns = schema.primary_key_columns(schema.TABLES_DDL[table_name])
+    stmt = db_backend.insert_statement(table_name, len(rows[0]), key_columns)
+    for start in range(0, len(rows), chunk_size):
+        connection.begin()
+        with connection.cursor() as cursor:
+            cursor.executemany(stmt, rows[start:start + chunk_size])
+        connection.commit()
+
+
+def table_reference(indexed):
+    """ Returns the stats_totals reference of the FROM clause, with a hint forcing a full scan if not indexed """
+    if indexed:
+        return 'stats_totals'
+    if db_backend.is_embedded():
+        return 'stats_totals NOT INDEXED'
+    return f"stats_totals IGNORE INDEX ({', '.join(['PRIMARY'] + list(schema.STATS_INDEXES))})"
+
+
+def time_queries(connection, runs):
+    """ Prints the average time of each query with a forced scan and with the indexes """
+    with connection.cursor() as cursor:
+        for name, where, parameters in QUERIES:
+            averages = []
+            for indexed in (False, True):
+                random.seed(1)
+                started = time.perf_counter()
+                for _ in range(runs):
+                    cursor.execute(f'SELECT COUNT(*), SUM(pts) FROM {table_reference(indexed)} WHERE {where}',
+                                   parameters())
+                    cursor.fetchall()
+                averages.append((time.perf_counter() - started) / runs * 1000)
+            print(f'{name:>20}: {averages[0]:8.3f} ms scan, {averages[1]:8.3f} ms indexed '
+                  f'({averages[0] / averages[1]:.0f}x), average of {runs} runs')
+
+
+def main(runs):
+    if config.DB_BACKEND == 'duckdb':
+        sys.exit('duckdb scans its columns instead of using these indexes, run with DB_BACKEND mysql or sqlite')
+    directory = None
+    if db_backend.is_embedded():
+        directory = tempfile.mkdtemp()
+        config.DB_LOCAL_PATH = os.path.join(directory, 'benchmark.sqlite')
+
+    build_database.migrate(None, None, None, BENCHMARK_DATABASE)
+    players, stats = synthetic_rows()
+    try:
+        with db_pool.connection(database=BENCHMARK_DATABASE) as connection:
+            insert(connection, 'players', players)
+            insert(connection, 'stats_totals', stats)
+            print(f'{config.DB_BACKEND}: {len(stats)} stats_totals rows, {len(SEASONS)} seasons')
+            time_queries(connection, runs)
+
+        if not db_backend.is_embedded():
+            build_database.ensure_stats_keys(None, None, None, BENCHMARK_DATABASE, partitioned=True)
+            print('stats_totals partitioned by season')
+            with db_pool.connection(database=BENCHMARK_DATABASE) as connection:
+                time_queries(connection, runs)
+    finally:
+        db_pool.close_all()
+        if directory:
+            shutil.rmtree(directory)
+        else:
+            with db_pool.transaction(database=None) as connection, connection.cursor() as cursor:
+                cursor.execute(f'DROP DATABASE IF EXISTS {BENCHMARK_DATABASE}')
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    if arguments and not arguments[0].isdigit():
+        config.DB_BACKEND = arguments.pop(0)
+    main(int(arguments[0]) if arguments else RUNS)
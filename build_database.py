@@ -1,41 +1,15 @@
-import pymysql
 import config
-import pvt_data_config
 import pandas as pd
 import logging
+import log_config
+import db_pool
+import db_backend
+from schema import STATS_KEY_COLUMNS, STATS_INDEXES, STATS_TABLES_DDL, TABLES_DDL, SCHEMA_VERSION_DDL, table_columns
 
-logging.basicConfig(filename='sql.log', encoding='utf-8', level=logging.INFO, format=config.LOG_FORMAT)
-
-
-def create_connection(host, user, password):
-    """
-    Creates connection to SQL without specifying the database name
-    Used only for creation of the database
-    :param host: name of the host
-    :param user: name of the user
-    :param password: MySQL password
-    :return: instance of a pymysql connection
-    """
-    return pymysql.connect(host=host,
-                           user=user,
-                           password=password,
-                           cursorclass=pymysql.cursors.DictCursor)
-
-
-def create_connection_db(host, user, password, database_name):
-    """
-    Creates connection to SQL with specified database
-    :param host: name of the host
-    :param user: name of the user
-    :param password: MySQL password
-    :param database_name: name of the database
-    :return: instance of a pymysql connection
-    """
-    return pymysql.connect(host=host,
-                           user=user,
-                           password=password,
-                           database=database_name,
-                           cursorclass=pymysql.cursors.DictCursor)
+# unique key of the stats tables created before they had a primary key
+LEGACY_STATS_UNIQUE_KEY = 'uq_player_season_team'
+# upper bounds of the season partitions (one per decade), the last partition takes the later seasons
+STATS_PARTITION_BOUNDS = list(range(1950, 2040, 10))
 
 
 def create_database(host, user, password, database_name):
@@ -45,278 +19,198 @@ def create_database(host, user, password, database_name):
     :param user: name of the user
     :param password: MySQL password
     :param database_name: name of the database
+    the embedded backends have no database to create, their file is created by the first connection
     """
-    connection = create_connection(host, user, password)
-    with connection.cursor() as cursor:
+    if db_backend.is_embedded():
+        return
+    with db_pool.transaction(host, user, password, database=None) as connection, connection.cursor() as cursor:
         sql = f"CREATE DATABASE IF NOT EXISTS {database_name}"
         cursor.execute(sql)
 
 
-def create_table_players(host, user, password, database_name):
-    """
-    Creates table 'players' in the database
-    :param host: name of the host
-    :param user: name of the user
-    :param password: MySQL password
-    :param database_name: name of the database
-    """
-    connection = create_connection_db(host, user, password, database_name)
-    with connection.cursor() as cursor:
-        sql = """CREATE TABLE IF NOT EXISTS players (
-            player_id varchar(100) not null,
-            name varchar(100),
-            primary key (player_id))"""
-        cursor.execute(sql)
-    connection.commit()
+def stats_partition_clause():
+    """ Returns the PARTITION BY clause splitting a stats table by season, one partition per decade """
+    partitions = [f'PARTITION p{bound - 10} VALUES LESS THAN ({bound})' for bound in STATS_PARTITION_BOUNDS]
+    partitions.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+    return 'PARTITION BY RANGE (season) (\n              ' + ',\n              '.join(partitions) + ')'
 
 
-def create_table_players_info(host, user, password, database_name):
+def stats_table_ddl(table_name, partitioned=config.STATS_PARTITION_BY_SEASON):
     """
-    Creates table 'players_info' in the database
-    :param host: name of the host
-    :param user: name of the user
-    :param password: MySQL password
-    :param database_name: name of the database
+    Returns the CREATE TABLE statement of a stats table
+    :param table_name: name of the stats table, e.g. 'stats_totals'
+    :param partitioned: if True the table is partitioned by season, MySQL does not support foreign keys on
+    partitioned tables so the foreign key to players is left out (the loaders insert the players first)
+    partitioning only applies to MySQL, the embedded backends ignore it
     """
-    connection = create_connection_db(host, user, password, database_name)
-    with connection.cursor() as cursor:
-        sql = """CREATE TABLE IF NOT EXISTS players_info (
-              player_id varchar(100) not null,
-              team_id varchar(100),
-              age int,
-              height decimal(18,9),
-              weight decimal(18,9),
-              college varchar(100),
-              country varchar(100),
-              draft_year int,
-              draft_round int,
-              draft_number int,
-              primary key (player_id))"""
-        cursor.execute(sql)
-    connection.commit()
+    ddl = STATS_TABLES_DDL[table_name]
+    if not partitioned or db_backend.is_embedded():
+        return ddl
+    ddl = ddl.replace(',\n              foreign key (player_id) references players(player_id))', ')')
+    return f'{ddl}\n{stats_partition_clause()}'
 
 
-def create_table_teams(host, user, password, database_name):
+def create_tables(cursor, database_name):
     """
-    Creates table 'teams' in the database
-    :param host: name of the host
-    :param user: name of the user
-    :param password: MySQL password
+    Creates the tables of the schema registry (TABLES_DDL) that do not exist yet
+    :param cursor: cursor of the migration session
     :param database_name: name of the database
     """
-    connection = create_connection_db(host, user, password, database_name)
-    with connection.cursor() as cursor:
-        sql = """CREATE TABLE IF NOT EXISTS teams (
-              team_id varchar(100) not null,
-              name varchar(100),
-              primary key (team_id))"""
-        cursor.execute(sql)
-    connection.commit()
+    for table_name, ddl in TABLES_DDL.items():
+        ddl = stats_table_ddl(table_name) if table_name in STATS_TABLES_DDL else ddl
+        for statement in db_backend.table_statements(table_name, ddl):
+            cursor.execute(statement)
+        logging.info(f'Table {table_name} created successfully')
 
 
-def create_table_stats_per_game(host, user, password, database_name):
+def add_columns(table_name, column_names):
     """
-    Creates table 'stats_per_game' in the database
-    :param host: name of the host
-    :param user: name of the user
-    :param password: MySQL password
+    Returns the migration step adding columns of the schema registry to a table, with their type in TABLES_DDL
+    Columns the table already has are skipped: migration 1 creates the tables from the current TABLES_DDL, so on a
+    new database the columns added to the registry exist before this step runs
+    :param table_name: name of the table
+    :param column_names: names of the columns added to the table DDL
+    :return: function(cursor, database_name)
+    """
+    def step(cursor, database_name):
+        existing = db_backend.live_columns(cursor, database_name, table_name)
+        column_types = dict(table_columns(TABLES_DDL[table_name]))
+        for name in column_names:
+            if name in existing:
+                continue
+            cursor.execute(f'ALTER TABLE {table_name} ADD COLUMN {name} {column_types[name]}')
+            logging.info(f'Column {name} added to table {table_name}')
+    return step
+
+
+def upgrade_stats_keys(cursor, database_name, partitioned=config.STATS_PARTITION_BY_SEASON):
+    """
+    Brings stats tables created by older versions up to the current DDL: adds the primary key and the secondary
+    indexes that are missing and, if partitioned is True, partitions the tables by season
+    :param cursor: cursor of the migration session
     :param database_name: name of the database
+    :param partitioned: if True the tables are partitioned by season (their foreign key is dropped)
+    only MySQL databases can predate the keys, the embedded ones are always created with the current DDL
     """
-    connection = create_connection_db(host, user, password, database_name)
-    with connection.cursor() as cursor:
-        sql = """CREATE TABLE IF NOT EXISTS stats_per_game (
-              player_id varchar(100) not null,
-              pos varchar(100),
-              team_season varchar(100),
-              season int,
-              g decimal(18,9),
-              gs decimal(18,9),
-              mp_per_g decimal(18,9),
-              fg_per_g decimal(18,9),
-              fga_per_g decimal(18,9),
-              fg_pct decimal(18,9),
-              fg3_per_g decimal(18,9),
-              fg3a_per_g decimal(18,9),
-              fg3_pct decimal(18,9),
-              fg2_per_g decimal(18,9),
-              fg2a_per_g decimal(18,9),
-              fg2_pct decimal(18,9),
-              efg_pct decimal(18,9),
-              ft_per_g decimal(18,9),
-              fta_per_g decimal(18,9),
-              ft_pct decimal(18,9),
-              orb_per_g decimal(18,9),
-              drb_per_g decimal(18,9),
-              trb_per_g decimal(18,9),
-              ast_per_g decimal(18,9),
-              stl_per_g decimal(18,9),
-              blk_per_g decimal(18,9),
-              tov_per_g decimal(18,9),
-              pf_per_g decimal(18,9),
-              pts_per_g decimal(18,9),
-              foreign key (player_id) references players(player_id))"""
-        cursor.execute(sql)
-    connection.commit()
-
-
-def create_table_stats_per_minute(host, user, password, database_name):
+    if db_backend.is_embedded():
+        return
+    cursor.execute("""SELECT table_name, index_name FROM information_schema.statistics
+                      WHERE table_schema = %s""", (database_name,))
+    indexes = {}
+    for table_name, index_name in cursor.fetchall():
+        indexes.setdefault(table_name, set()).add(index_name)
+
+    for table_name in STATS_TABLES_DDL:
+        table_indexes = indexes.get(table_name, set())
+        changes = []
+        if 'PRIMARY' not in table_indexes:
+            changes += ['MODIFY season int not null', 'MODIFY team_season varchar(100) not null',
+                        f"ADD PRIMARY KEY ({', '.join(STATS_KEY_COLUMNS)})"]
+        if LEGACY_STATS_UNIQUE_KEY in table_indexes:
+            changes.append(f'DROP INDEX {LEGACY_STATS_UNIQUE_KEY}')
+        changes += [f"ADD KEY {index_name} ({', '.join(columns)})" for index_name, columns in STATS_INDEXES.items()
+                    if index_name not in table_indexes]
+        if changes:
+            cursor.execute(f"ALTER TABLE {table_name} {', '.join(changes)}")
+            logging.info(f'Keys of table {table_name} updated: {changes}')
+
+    if partitioned:
+        cursor.execute("""SELECT table_name FROM information_schema.partitions
+                          WHERE table_schema = %s AND partition_name IS NOT NULL""", (database_name,))
+        partitioned_tables = {row[0] for row in cursor.fetchall()}
+        cursor.execute("""SELECT table_name, constraint_name FROM information_schema.referential_constraints
+                          WHERE constraint_schema = %s""", (database_name,))
+        foreign_keys = cursor.fetchall()
+        for table_name in STATS_TABLES_DDL:
+            if table_name in partitioned_tables:
+                continue
+            for fk_table, constraint_name in foreign_keys:
+                if fk_table == table_name:
+                    cursor.execute(f"ALTER TABLE {table_name} DROP FOREIGN KEY {constraint_name}")
+            cursor.execute(f"ALTER TABLE {table_name} {stats_partition_clause()}")
+            logging.info(f'Table {table_name} partitioned by season')
+
+
+def ensure_stats_keys(host, user, password, database_name, partitioned=config.STATS_PARTITION_BY_SEASON):
     """
-    Creates table 'stats_per_minute' in the database
+    Runs upgrade_stats_keys outside of the migrations, e.g. to partition the stats tables of a database that was
+    migrated while config.STATS_PARTITION_BY_SEASON was False
     :param host: name of the host
     :param user: name of the user
     :param password: MySQL password
     :param database_name: name of the database
+    :param partitioned: if True the tables are partitioned by season (their foreign key is dropped)
     """
-    connection = create_connection_db(host, user, password, database_name)
-    with connection.cursor() as cursor:
-        sql = """CREATE TABLE IF NOT EXISTS stats_per_minute (
-              player_id varchar(100) not null,
-              pos varchar(100),
-              team_season varchar(100),
-              season int,
-              g decimal(18,9),
-              gs decimal(18,9),
-              mp decimal(18,9),
-              fg_per_mp decimal(18,9),
-              fga_per_mp decimal(18,9),
-              fg_pct decimal(18,9),
-              fg3_per_mp decimal(18,9),
-              fg3a_per_mp decimal(18,9),
-              fg3_pct decimal(18,9),
-              fg2_per_mp decimal(18,9),
-              fg2a_per_mp decimal(18,9),
-              fg2_pct decimal(18,9),
-              ft_per_mp decimal(18,9),
-              fta_per_mp decimal(18,9),
-              ft_pct decimal(18,9),
-              orb_per_mp decimal(18,9),
-              drb_per_mp decimal(18,9),
-              trb_per_mp decimal(18,9),
-              ast_per_mp decimal(18,9),
-              stl_per_mp decimal(18,9),
-              blk_per_mp decimal(18,9),
-              tov_per_mp decimal(18,9),
-              pf_per_mp decimal(18,9),
-              pts_per_mp decimal(18,9),
-              foreign key (player_id) references players(player_id))"""
-        cursor.execute(sql)
-    connection.commit()
+    with db_pool.transaction(host, user, password, database_name) as connection, connection.cursor() as cursor:
+        upgrade_stats_keys(cursor, database_name, partitioned)
+
 
+# schema migrations: (version, description, steps), a step is a sql statement or a function(cursor, database_name)
+# changes to the schema (new columns, new indexes) are appended as a new migration, applied ones are never edited
+# migration 1 creates the tables from the current registry, so a new database already has the later changes:
+# the steps of later migrations check the live schema first (add_columns for new columns, upgrade_stats_keys for keys)
+SCHEMA_MIGRATIONS = [
+    (1, 'create tables', [create_tables]),
+    # databases created before the schema was versioned may have stats tables without keys
+    (2, 'stats tables primary keys and indexes', [upgrade_stats_keys]),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
 
-def create_table_stats_per_poss(host, user, password, database_name):
+
+def current_schema_version(host, user, password, database_name):
     """
-    Creates table 'stats_per_poss' in the database
+    Returns the version of the schema stored in the database, 0 if the database or its schema_version table
+    does not exist yet
     :param host: name of the host
     :param user: name of the user
     :param password: MySQL password
     :param database_name: name of the database
     """
-    connection = create_connection_db(host, user, password, database_name)
-    with connection.cursor() as cursor:
-        sql = """CREATE TABLE IF NOT EXISTS stats_per_poss (
-              player_id varchar(100) not null,
-              pos varchar(100),
-              team_season varchar(100),
-              season int,
-              g decimal(18,9),
-              gs decimal(18,9),
-              mp decimal(18,9),
-              fg_per_poss decimal(18,9),
-              fga_per_poss decimal(18,9),
-              fg_pct decimal(18,9),
-              fg3_per_poss decimal(18,9),
-              fg3a_per_poss decimal(18,9),
-              fg3_pct decimal(18,9),
-              fg2_per_poss decimal(18,9),
-              fg2a_per_poss decimal(18,9),
-              fg2_pct decimal(18,9),
-              ft_per_poss decimal(18,9),
-              fta_per_poss decimal(18,9),
-              ft_pct decimal(18,9),
-              orb_per_poss decimal(18,9),
-              drb_per_poss decimal(18,9),
-              trb_per_poss decimal(18,9),
-              ast_per_poss decimal(18,9),
-              stl_per_poss decimal(18,9),
-              blk_per_poss decimal(18,9),
-              tov_per_poss decimal(18,9),
-              pf_per_poss decimal(18,9),
-              pts_per_poss decimal(18,9),
-              off_rtg decimal(18,9),
-              def_rtg decimal(18,9),
-              foreign key (player_id) references players(player_id))"""
-        cursor.execute(sql)
-    connection.commit()
-
-
-def create_table_stats_totals(host, user, password, database_name):
+    try:
+        with db_pool.connection(host, user, password, database_name) as connection, \
+                connection.cursor() as cursor:
+            cursor.execute('SELECT MAX(version) FROM schema_version')
+            version = cursor.fetchone()[0]
+    except Exception as exc:
+        if db_backend.is_missing_schema_error(exc):
+            return 0
+        raise
+    return version or 0
+
+
+def migrate(host, user, password, database_name):
     """
-    Creates table 'stats_totals' in the database
+    Applies the migrations newer than the version stored in the database, all of them in a single session
+    When the schema is up to date only its version is read
     :param host: name of the host
     :param user: name of the user
     :param password: MySQL password
     :param database_name: name of the database
+    :return: version of the schema after the migrations
     """
-    connection = create_connection_db(host, user, password, database_name)
-    with connection.cursor() as cursor:
-        sql = """CREATE TABLE IF NOT EXISTS stats_totals (
-              player_id varchar(100) not null,
-              pos varchar(100),
-              team_season varchar(100),
-              season int,
-              g decimal(18,9),
-              gs decimal(18,9),
-              mp decimal(18,9),
-              fg decimal(18,9),
-              fga decimal(18,9),
-              fg_pct decimal(18,9),
-              fg3 decimal(18,9),
-              fg3a decimal(18,9),
-              fg3_pct decimal(18,9),
-              fg2 decimal(18,9),
-              fg2a decimal(18,9),
-              fg2_pct decimal(18,9),
-              efg_pct decimal(18,9),
-              ft decimal(18,9),
-              fta decimal(18,9),
-              ft_pct decimal(18,9),
-              orb decimal(18,9),
-              drb decimal(18,9),
-              trb decimal(18,9),
-              ast decimal(18,9),
-              stl decimal(18,9),
-              blk decimal(18,9),
-              tov decimal(18,9),
-              pf decimal(18,9),
-              pts decimal(18,9),
-              foreign key (player_id) references players(player_id))"""
-        cursor.execute(sql)
-    connection.commit()
-
-
-def create_table_twitter_details(host, user, password, database_name):
-    """
-        Creates table 'twitter_details' in the database
-        :param host: name of the host
-        :param user: name of the user
-        :param password: MySQL password
-        :param database_name: name of the database
-        """
-    connection = create_connection_db(host, user, password, database_name)
-    with connection.cursor() as cursor:
-        sql = """CREATE TABLE IF NOT EXISTS twitter_details (
-                  player_id varchar(100) not null,
-                  creation_date date,
-                  user_name varchar(100),
-                  twitter_id varchar(100),
-                  followers_count bigint,
-                  following_count bigint,
-                  tweet_count bigint,
-                  listed_count bigint,
-                  description varchar(500),
-                  primary key (player_id))"""
-        cursor.execute(sql)
-    connection.commit()
+    version = current_schema_version(host, user, password, database_name)
+    if version >= SCHEMA_VERSION:
+        logging.info(f'Schema of database {database_name} is up to date (version {version})')
+        return version
+
+    if version == 0:
+        create_database(host=host, user=user, password=password, database_name=database_name)
+        logging.info(f'Database created successfully')
+
+    with db_pool.connection(host, user, password, database_name) as connection, connection.cursor() as cursor:
+        cursor.execute(SCHEMA_VERSION_DDL)
+        for migration_version, description, steps in SCHEMA_MIGRATIONS:
+            if migration_version <= version:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(cursor, database_name)
+                else:
+                    cursor.execute(step)
+            cursor.execute('INSERT INTO schema_version VALUES (%s, %s, CURRENT_TIMESTAMP)', (migration_version, description))
+            connection.commit()
+            logging.info(f'Migration {migration_version} ({description}) applied to database {database_name}')
+    return SCHEMA_VERSION
 
 
 def database_exists(host, user, password, database_name):
@@ -325,10 +219,9 @@ def database_exists(host, user, password, database_name):
     :param database_name: name of database that the function will check if exists
     :return: True if database exists, else False
     """
-    connection = create_connection(host, user, password)
-    with connection.cursor() as cursor:
+    with db_pool.connection(host, user, password, database=None) as connection:
         sql = f"SHOW DATABASES"
-    df = pd.read_sql(sql, connection)
+        df = pd.read_sql(sql, connection)
     return True if database_name in df['Database'].tolist() else False
 
 
@@ -338,54 +231,26 @@ def table_exists(host, user, password, database_name, table_name):
     :param database_name: name of database that the function will check if exists
     :return: True if database exists, else False
     """
-    connection = create_connection_db(host, user, password, database_name)
-    with connection.cursor() as cursor:
+    with db_pool.connection(host, user, password, database_name) as connection:
         sql = f"SHOW TABLES"
-    df = pd.read_sql(sql, connection)
+        df = pd.read_sql(sql, connection)
     return True if table_name in df[f'Tables_in_{database_name}'].tolist() else False
 
 
-def build_database_with_tables(host=pvt_data_config.HOST, user=pvt_data_config.USER, password=pvt_data_config.PASSWORD,
-                               database_name=config.DATABASE_NAME):
+def build_database_with_tables(host=None, user=None, password=None, database_name=config.DATABASE_NAME):
     """
-    Executes all commands to build the database schema for nba_data
+    Builds or upgrades the database schema for nba_data, routine runs with an up to date schema only read its version
     Created tables names: 'players', 'players_info', 'teams', 'stats_per_game', 'stats_per_minute',
-    'stats_per_poss', 'stats_totals'
-    :param host: name of the host
-    :param user: name of the user
-    :param password: MySQL password
+    'stats_per_poss', 'stats_totals', 'twitter_details', 'twitter_snapshots'
+    :param host: name of the host, None for pvt_data_config.HOST
+    :param user: name of the user, None for pvt_data_config.USER
+    :param password: MySQL password, None for pvt_data_config.PASSWORD
     :param database_name: name of the database
     """
-    # Checks if database exists before creating
-    create_database(host=host, user=user, password=password, database_name=database_name)
-    logging.info(f'Database created successfully')
-
-    # Creates each table (if it exists or not is verified within the query)
-    create_table_players(host=host, user=user, password=password, database_name=database_name)
-    logging.info(f'Table players created successfully')
-
-    create_table_players_info(host=host, user=user, password=password, database_name=database_name)
-    logging.info(f'Table players_info created successfully')
-
-    create_table_teams(host=host, user=user, password=password, database_name=database_name)
-    logging.info(f'Table teams created successfully')
-
-    create_table_stats_per_game(host=host, user=user, password=password, database_name=database_name)
-    logging.info(f'Table stats_per_game created successfully')
-
-    create_table_stats_per_minute(host=host, user=user, password=password, database_name=database_name)
-    logging.info(f'Table stats_per_minute created successfully')
-
-    create_table_stats_per_poss(host=host, user=user, password=password, database_name=database_name)
-    logging.info(f'Table stats_per_poss created successfully')
-
-    create_table_stats_totals(host=host, user=user, password=password, database_name=database_name)
-    logging.info(f'Table stats_totals created successfully')
-
-    create_table_twitter_details(host=host, user=user, password=password, database_name=database_name)
-    logging.info(f'Table twitter_details created successfully')
+    # only the migrations newer than the version stored in the database are applied
+    migrate(host=host, user=user, password=password, database_name=database_name)
 
 
 if __name__ == "__main__":
-    build_database_with_tables(host=pvt_data_config.HOST, user=pvt_data_config.USER, password=pvt_data_config.PASSWORD,
-                               database_name=config.DATABASE_NAME)
\ No newline at end of file
+    log_config.setup_logging('sql.log')
+    build_database_with_tables(database_name=config.DATABASE_NAME)
\ No newline at end of file
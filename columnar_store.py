@@ -0,0 +1,132 @@
+import os
+import glob
+import logging
+import pandas as pd
+import config
+from schema import STATS_TABLES_DDL, table_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    ds = None
+    feather = None
+    pq = None
+
+# columns of the stats tables that have a different name on the scraped rows
+STATS_SOURCE_COLUMNS = {'team_season': 'team_id'}
+# partition column, stored in the directory names and not inside the files
+PARTITION_COLUMN = 'season'
+
+
+def _check_pyarrow():
+    """ Raises an informative error when the optional dependency pyarrow is missing """
+    if pa is None:
+        logging.critical('pyarrow is not installed, columnar dataset output is not available')
+        raise ImportError('pyarrow is required for the columnar dataset, install it with: pip install pyarrow')
+
+
+def _arrow_type(sql_type):
+    """ Converts a sql type from the schema DDL to an arrow type """
+    if sql_type.startswith('varchar'):
+        return pa.string()
+    if sql_type.startswith('decimal'):
+        return pa.float32()
+    if sql_type == 'bigint':
+        return pa.int64()
+    if sql_type == 'int':
+        return pa.int32()
+    if sql_type == 'date':
+        return pa.date32()
+    raise TypeError(f'No arrow type defined for sql type {sql_type}')
+
+
+def stats_schema(table_name):
+    """
+    Returns the arrow schema of a stats table, derived from its DDL in schema (without the partition column)
+    :param table_name: name of the stats table, e.g. 'stats_totals'
+    :return: pyarrow schema
+    """
+    _check_pyarrow()
+    return pa.schema([(name, _arrow_type(sql_type)) for name, sql_type in table_columns(STATS_TABLES_DDL[table_name])
+                      if name != PARTITION_COLUMN])
+
+
+def _file_extension():
+    """ Returns the extension of the dataset files according to config.DATASET_FORMAT """
+    return 'feather' if config.DATASET_FORMAT == 'feather' else 'parquet'
+
+
+def _dataset_format():
+    """ Returns the pyarrow.dataset format name according to config.DATASET_FORMAT """
+    return 'ipc' if config.DATASET_FORMAT == 'feather' else 'parquet'
+
+
+def _partitioning():
+    """ Returns the hive partitioning of a stats table directory (season=YYYY) """
+    return ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.int32())]), flavor='hive')
+
+
+def write_stats_partition(list_of_dicts, year, stat_type):
+    """
+    Writes the statistics of one season to the dataset, the file is replaced if it already exists
+    Layout: DATASET_DIR/stats_{stat_type}/season={year}/part-0.{parquet|feather}
+    :param list_of_dicts: a list of dicts where each dict is equivalent to a table row with statistics of a player,
+    or the typed DataFrame of the columnar mode (used as is, without copying the rows)
+    :param year: year the season finished
+    :param stat_type: type of stat(_totals, _per_game, _per_minute, _per_poss)
+    :return: path of the written file
+    """
+    _check_pyarrow()
+    table_name = f'stats{stat_type}'
+    schema = stats_schema(table_name)
+    df = list_of_dicts if isinstance(list_of_dicts, pd.DataFrame) else pd.DataFrame(list_of_dicts)
+
+    arrays = []
+    for field in schema:
+        source = STATS_SOURCE_COLUMNS.get(field.name, field.name)
+        if source not in df:
+            # column not published for this season
+            arrays.append(pa.nulls(len(df), type=field.type))
+            continue
+        values = df[source]
+        if pa.types.is_string(field.type):
+            # categorical columns of the typed frame are stored as plain strings, their missing values as nulls
+            arrays.append(pa.array(values.astype(object), type=field.type, from_pandas=True))
+        else:
+            arrays.append(pa.array(pd.to_numeric(values, errors='coerce'), type=field.type, from_pandas=True))
+    table = pa.Table.from_arrays(arrays, schema=schema)
+
+    directory = os.path.join(config.DATASET_DIR, table_name, f'{PARTITION_COLUMN}={year}')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'part-0.{_file_extension()}')
+    if config.DATASET_FORMAT == 'feather':
+        feather.write_feather(table, path)
+    else:
+        pq.write_table(table, path)
+    logging.info(f'{len(df)} rows of {table_name} for season {year} written to {path}')
+    return path
+
+
+def read_stats(stat_type, seasons=None, columns=None, filter_expression=None):
+    """
+    Reads a stats table from the dataset, only the requested seasons (partitions) and columns are read
+    :param stat_type: type of stat(_totals, _per_game, _per_minute, _per_poss)
+    :param seasons: list of seasons to read, None for all
+    :param columns: list of columns to read, None for all (the season column can be requested too)
+    :param filter_expression: extra pyarrow.dataset expression pushed down to the scan, e.g. ds.field('g') > 40
+    :return: DataFrame with the requested rows and columns
+    """
+    _check_pyarrow()
+    path = os.path.join(config.DATASET_DIR, f'stats{stat_type}')
+    # only files of the configured format are read, so switching DATASET_FORMAT never mixes file types
+    files = sorted(glob.glob(os.path.join(path, f'{PARTITION_COLUMN}=*', f'*.{_file_extension()}')))
+    dataset = ds.dataset(files, format=_dataset_format(), partitioning=_partitioning(), partition_base_dir=path)
+    expression = filter_expression
+    if seasons is not None:
+        season_filter = ds.field(PARTITION_COLUMN).isin(list(seasons))
+        expression = season_filter if expression is None else expression & season_filter
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
@@ -12,4 +12,65 @@ INCHES_TO_CM = 2.54
 POUNDS_TO_KG = 0.453592
 WAITING_TIME_SELENIUM = 10
 TWITTER_ADDRESSED_LIST = "https://www.basketball-reference.com/friv/twitter.html"
-TWITTER_USERS_LIMIT_API = 100
\ No newline at end of file
+TWITTER_USERS_LIMIT_API = 100
+
+FETCH_MAX_WORKERS = 8
+FETCH_POOL_SIZE = 8
+FETCH_MAX_CONCURRENCY_PER_HOST = 2
+FETCH_MIN_INTERVAL_PER_HOST = 1.0
+FETCH_TIMEOUT = 30
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_DIR = '.http_cache'
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+HTTP_CACHE_EVICT_TO_RATIO = 0.8
+HTTP_CACHE_CURRENT_SEASON_TTL = 6 * 60 * 60
+HTTP_CACHE_DEFAULT_TTL = 24 * 60 * 60
+PARSED_TABLES_MEMO_SIZE = 50
+HTML_PARSER_BACKEND = 'lxml'
+STATS_COLUMNAR = False
+LOG_FILENAME = 'nba_web_scrapping.log'
+LOG_DEBUG = False
+DATASET_OUTPUT = False
+DATASET_DIR = 'nba_dataset'
+DATASET_FORMAT = 'parquet'
+STREAM_QUEUE_SIZE = 8
+SCHEDULER_MAX_WORKERS = 4
+RUN_MANIFEST_FILE = 'run_manifest.json'
+RUN_PARTS_DIR = 'run_parts'
+RUN_CURRENT_SEASON_MAX_AGE = 6 * 60 * 60
+RUN_TWITTER_MAX_AGE = 24 * 60 * 60
+SELENIUM_MAX_DRIVERS = 2
+SELENIUM_RETRIES = 2
+NBA_BIO_SOURCE = 'json'
+NBA_STATS_API_URL = 'https://stats.nba.com/stats/leaguedashplayerbiostats'
+NBA_STATS_API_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                                       '(KHTML, like Gecko) Chrome/83.0.4103.116 Safari/537.36',
+                         'Referer': 'https://www.nba.com/',
+                         'Origin': 'https://www.nba.com',
+                         'Accept': 'application/json, text/plain, */*',
+                         'x-nba-stats-origin': 'stats',
+                         'x-nba-stats-token': 'true'}
+NBA_BIO_EXTRACTION = 'script'
+PLAYER_INDEX_FILE = 'player_index.json'
+PLAYER_INDEX_FUZZY_CUTOFF = 0.88
+TWITTER_API_URL = 'https://api.twitter.com/2/users/by'
+TWITTER_MAX_CONCURRENCY = 4
+TWITTER_MAX_RETRIES = 5
+TWITTER_BACKOFF_BASE = 1.0
+TWITTER_BACKOFF_MAX = 60.0
+TWITTER_INCREMENTAL = True
+TWITTER_REFRESH_MAX_AGE = 7 * 24 * 60 * 60
+TWITTER_FETCH_STATE_FILE = 'twitter_fetch_state.json'
+TWITTER_SNAPSHOTS_FILE = 'twitter_snapshots.csv'
+TWITTER_RUN_SNAPSHOTS_FILE = 'twitter_run_snapshots.csv'
+DB_POOL_SIZE = 4
+DB_POOL_HEALTH_CHECK_INTERVAL = 30
+DB_LOAD_MODE = 'insert'
+DB_INSERT_CHUNK_SIZE = 1000
+DB_DEFER_FK_CHECKS = False
+DB_DEFER_UNIQUE_CHECKS = False
+STATS_PARTITION_BY_SEASON = False
+DB_BACKEND = 'mysql'
+DB_LOCAL_PATH = None
+DB_LOCAL_DEFAULT_PATHS = {'duckdb': 'nba_data.duckdb', 'sqlite': 'nba_data.sqlite'}
+DB_SQLITE_BUSY_TIMEOUT = 30
@@ -0,0 +1,240 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+import pandas as pd
+import pymysql
+import config
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# backends storing the database in a local file (see local_path) instead of a MySQL server
+EMBEDDED_BACKENDS = ('duckdb', 'sqlite')
+# MySQL error codes of a database or a table that does not exist
+UNKNOWN_DATABASE_ERROR = 1049
+UNKNOWN_TABLE_ERROR = 1146
+# VALUES clause of a single row INSERT, replaced by a scan of the registered rows for bulk inserts in duckdb
+_VALUES_CLAUSE = re.compile(r'VALUES \(\?(?:, \?)*\)')
+_INDEX_LINE = re.compile(r'key (\w+) \(([^)]*)\)')
+_BULK_ROWS = 'bulk_rows'
+
+# duckdb databases opened by the process, {absolute path of the file: connection}, the pooled connections are
+# cursors of the connection of their file
+_duckdb_roots = {}
+_duckdb_roots_lock = threading.Lock()
+
+
+def backend():
+    """ Returns the configured storage backend: 'mysql', 'duckdb' or 'sqlite' """
+    if config.DB_BACKEND not in ('mysql',) + EMBEDDED_BACKENDS:
+        raise ValueError(f'Unknown database backend {config.DB_BACKEND}, expected mysql, duckdb or sqlite')
+    return config.DB_BACKEND
+
+
+def is_embedded():
+    """ Returns True if the database runs in-process (duckdb or sqlite) """
+    return backend() in EMBEDDED_BACKENDS
+
+
+def local_path():
+    """ Returns the file of the embedded database: config.DB_LOCAL_PATH, else the default file of the backend """
+    return config.DB_LOCAL_PATH or config.DB_LOCAL_DEFAULT_PATHS[backend()]
+
+
+def _check_duckdb():
+    """ Raises an informative error when the optional dependency duckdb is missing """
+    if duckdb is None:
+        logging.critical('duckdb is not installed, the duckdb backend is not available')
+        raise ImportError('duckdb is required for the duckdb backend, install it with: pip install duckdb')
+
+
+def translate(sql):
+    """ Converts the pymysql parameter style (%s) of a statement to the qmark style (?) of the embedded engines """
+    return sql.replace('%s', '?')
+
+
+def _get_duckdb_root(path):
+    """ Returns the duckdb connection of the process to a database file, opening the file on first use """
+    key = os.path.abspath(path)
+    with _duckdb_roots_lock:
+        if key not in _duckdb_roots:
+            _check_duckdb()
+            _duckdb_roots[key] = duckdb.connect(path)
+            logging.info(f'DuckDB database {path} opened')
+        return _duckdb_roots[key]
+
+
+class EmbeddedCursor:
+    """ Cursor of an embedded database with the pymysql cursor interface used by the loaders """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._result = None
+
+    def execute(self, query, args=None):
+        """ Executes a statement written for pymysql, returns the number of affected rows when known """
+        self._result = self._connection.raw.execute(translate(query), tuple(args) if args is not None else ())
+        return getattr(self._result, 'rowcount', -1)
+
+    def executemany(self, query, args):
+        """
+        Executes a statement for each tuple of args
+        duckdb inserts the whole list in one statement from a DataFrame, row by row inserts are very slow there
+        """
+        args = list(args)
+        query = translate(query)
+        if self._connection.kind == 'duckdb' and query.lstrip().upper().startswith('INSERT') and args:
+            raw = self._connection.raw
+            raw.register(_BULK_ROWS, pd.DataFrame(args, dtype=object))
+            try:
+                raw.execute(_VALUES_CLAUSE.sub(f'SELECT * FROM {_BULK_ROWS}', query, count=1))
+            finally:
+                raw.unregister(_BULK_ROWS)
+            return len(args)
+        self._result = self._connection.raw.executemany(query, args)
+        return len(args)
+
+    def fetchall(self):
+        return self._result.fetchall() if self._result is not None else []
+
+    def fetchone(self):
+        return self._result.fetchone() if self._result is not None else None
+
+
+class EmbeddedConnection:
+    """ Connection to an embedded database with the pymysql connection interface used by db_pool """
+
+    def __init__(self, kind, raw):
+        self.kind = kind
+        self.raw = raw
+        self._in_transaction = False
+
+    def cursor(self):
+        return EmbeddedCursor(self)
+
+    def begin(self):
+        if not self._in_transaction:
+            self.raw.execute('BEGIN TRANSACTION')
+            self._in_transaction = True
+
+    def commit(self):
+        if self._in_transaction:
+            self.raw.execute('COMMIT')
+            self._in_transaction = False
+
+    def rollback(self):
+        if self._in_transaction:
+            self._in_transaction = False
+            self.raw.execute('ROLLBACK')
+
+    def ping(self, reconnect=False):
+        """ Embedded connections are never lost """
+        return True
+
+    def close(self):
+        self.raw.close()
+
+
+def connect(path=None):
+    """
+    Opens a connection to the embedded database of config.DB_BACKEND
+    statements outside of begin/commit are committed immediately
+    :param path: database file, defaults to local_path()
+    :return: EmbeddedConnection
+    """
+    path = path or local_path()
+    kind = backend()
+    if kind == 'duckdb':
+        raw = _get_duckdb_root(path).cursor()
+    else:
+        raw = sqlite3.connect(path, isolation_level=None, check_same_thread=False,
+                              timeout=config.DB_SQLITE_BUSY_TIMEOUT)
+        raw.execute('PRAGMA foreign_keys = ON')
+    return EmbeddedConnection(kind, raw)
+
+
+def table_statements(table_name, ddl):
+    """
+    Returns the statements creating a table of the schema registry on the configured backend
+    The embedded engines do not accept the inline secondary keys of the MySQL DDL, they become CREATE INDEX statements
+    :param table_name: name of the table
+    :param ddl: MySQL CREATE TABLE statement of the table
+    :return: list of statements
+    """
+    if not is_embedded():
+        return [ddl]
+
+    lines = [line.strip().rstrip(',') for line in ddl[ddl.index('(') + 1:ddl.rindex(')')].splitlines()]
+    columns = []
+    indexes = []
+    for line in lines:
+        index = _INDEX_LINE.fullmatch(line)
+        if index:
+            indexes.append(f'CREATE INDEX IF NOT EXISTS {table_name}_{index.group(1)} '
+                           f'ON {table_name} ({index.group(2)})')
+        elif line:
+            columns.append(line)
+    create = ddl[:ddl.index('(') + 1] + '\n              ' + ',\n              '.join(columns) + ')'
+    return [create] + indexes
+
+
+def insert_statement(table_name, values_count, key_columns, update_cols=None, ignore_duplicates=False):
+    """
+    Returns the INSERT statement of a table for the configured backend, with the pymysql parameter style
+    :param table_name: name of the table
+    :param values_count: number of values of a row
+    :param key_columns: primary key columns of the table, target of the upsert on the embedded engines
+    :param update_cols: if given, rows whose key already exists get these columns updated
+    :param ignore_duplicates: if True, rows whose key already exists are skipped
+    """
+    placeholders = ', '.join(['%s'] * values_count)
+    if not is_embedded():
+        ignore = ' IGNORE' if ignore_duplicates else ''
+        stmt = f"INSERT{ignore} INTO {table_name} VALUES ({placeholders})"
+        if update_cols:
+            stmt += ' ON DUPLICATE KEY UPDATE ' + ', '.join(f'{col} = VALUES({col})' for col in update_cols)
+        return stmt
+
+    ignore = ' OR IGNORE' if ignore_duplicates else ''
+    stmt = f"INSERT{ignore} INTO {table_name} VALUES ({placeholders})"
+    if update_cols:
+        stmt += (f" ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+                 + ', '.join(f'{col} = excluded.{col}' for col in update_cols))
+    return stmt
+
+
+def live_columns(cursor, database_name, table_name):
+    """
+    Returns the names of the columns a table has in the database, which may differ from its registry DDL
+    :param cursor: cursor of the database
+    :param database_name: name of the database (MySQL only)
+    :param table_name: name of the table
+    """
+    if backend() == 'sqlite':
+        cursor.execute(f'PRAGMA table_info({table_name})')
+        return {row[1].lower() for row in cursor.fetchall()}
+    if backend() == 'duckdb':
+        cursor.execute('SELECT column_name FROM information_schema.columns WHERE table_name = %s', (table_name,))
+    else:
+        cursor.execute("""SELECT column_name FROM information_schema.columns
+                          WHERE table_schema = %s AND table_name = %s""", (database_name, table_name))
+    return {row[0].lower() for row in cursor.fetchall()}
+
+
+def is_missing_schema_error(exc):
+    """ Returns True if exc was raised because the database or the table queried does not exist yet """
+    if isinstance(exc, (pymysql.err.OperationalError, pymysql.err.ProgrammingError)):
+        return exc.args[0] in (UNKNOWN_DATABASE_ERROR, UNKNOWN_TABLE_ERROR)
+    if isinstance(exc, sqlite3.OperationalError):
+        return 'no such table' in str(exc)
+    return duckdb is not None and isinstance(exc, duckdb.CatalogException)
@@ -0,0 +1,156 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+import pymysql
+import config
+import db_backend
+
+# one pool per server and database, per database file for the embedded backends (see _pool_key):
+# {key: (idle connections, connection slots)}
+# idle connections are stored as (connection, time it was returned to the pool)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(host, user, database):
+    """
+    Returns the key of the pool of a server and database, (host, user, database) on MySQL and (backend, absolute
+    path of the file) on the embedded backends, so a changed DB_LOCAL_PATH never gets connections to the old file
+    """
+    if db_backend.is_embedded():
+        return config.DB_BACKEND, os.path.abspath(db_backend.local_path())
+    return host, user, database
+
+
+def _get_pool(host, user, database):
+    """ Returns the idle connections queue and the slots semaphore of a server and database """
+    key = _pool_key(host, user, database)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = (queue.LifoQueue(), threading.BoundedSemaphore(config.DB_POOL_SIZE))
+        return _pools[key]
+
+
+def _mysql_credentials(host, user, password):
+    """
+    Returns the MySQL host, user and password, the ones that are None are read from pvt_data_config
+    The credentials file is only imported here, so the embedded backends work without it
+    """
+    import pvt_data_config
+    return (pvt_data_config.HOST if host is None else host,
+            pvt_data_config.USER if user is None else user,
+            pvt_data_config.PASSWORD if password is None else password)
+
+
+def _create_connection(host, user, password, database):
+    """
+    Opens a new connection, without database when database is None (used to create the database)
+    LOAD DATA LOCAL INFILE is allowed only when the stats are bulk loaded from files (config.DB_LOAD_MODE)
+    With an embedded backend (config.DB_BACKEND) the connection goes to the local database file instead
+    :param host: name of the host, None for pvt_data_config.HOST (same for user and password)
+    """
+    if db_backend.is_embedded():
+        connection = db_backend.connect()
+        logging.info(f'New {config.DB_BACKEND} connection opened to {db_backend.local_path()}')
+        return connection
+    host, user, password = _mysql_credentials(host, user, password)
+    connection = pymysql.connect(host=host, user=user, password=password, database=database,
+                                 local_infile=config.DB_LOAD_MODE == 'infile')
+    logging.info(f'New MySQL connection opened to {host} database {database}')
+    return connection
+
+
+def database_url(host=None, database=config.DATABASE_NAME):
+    """ Returns the url of the database the pool connects to, e.g. mysql://host/nba_data or sqlite:///path/file """
+    if db_backend.is_embedded():
+        return f'{config.DB_BACKEND}:///{os.path.abspath(db_backend.local_path())}'
+    return f'mysql://{_mysql_credentials(host, None, None)[0]}/{database}'
+
+
+def _is_healthy(connection, idle_since):
+    """ Checks that a connection idle for longer than DB_POOL_HEALTH_CHECK_INTERVAL still answers """
+    if time.monotonic() - idle_since < config.DB_POOL_HEALTH_CHECK_INTERVAL:
+        return True
+    try:
+        connection.ping(reconnect=False)
+        return True
+    except pymysql.err.Error:
+        return False
+
+
+def _close(connection):
+    """ Closes a connection, ignoring errors of connections already lost """
+    try:
+        connection.close()
+    except pymysql.err.Error as exc:
+        logging.warning(f'Could not close MySQL connection, exception {exc}')
+
+
+@contextmanager
+def connection(host=None, user=None, password=None, database=config.DATABASE_NAME):
+    """
+    Lends a connection from the pool, at most DB_POOL_SIZE connections per database are open at the same time
+    Connections lost while idle are replaced, a connection that raised an error is closed instead of reused
+    :param host: MySQL host, None for pvt_data_config.HOST (same for user and password)
+    :param database: name of the database, None for a connection to the server only
+    """
+    idle_connections, slots = _get_pool(host, user, database)
+    with slots:
+        conn = None
+        while conn is None:
+            try:
+                conn, idle_since = idle_connections.get_nowait()
+            except queue.Empty:
+                conn = _create_connection(host, user, password, database)
+                break
+            if not _is_healthy(conn, idle_since):
+                logging.warning('Discarding lost MySQL connection from the pool')
+                _close(conn)
+                conn = None
+
+        try:
+            yield conn
+        except BaseException:
+            _close(conn)
+            raise
+        idle_connections.put((conn, time.monotonic()))
+
+
+@contextmanager
+def transaction(host=None, user=None, password=None, database=config.DATABASE_NAME):
+    """
+    Lends a connection from the pool for one transaction: committed when the block ends, rolled back on error
+    :param host: MySQL host, None for pvt_data_config.HOST (same for user and password)
+    :param database: name of the database, None for a connection to the server only
+    """
+    with connection(host, user, password, database) as conn:
+        conn.begin()
+        try:
+            yield conn
+        except BaseException:
+            try:
+                conn.rollback()
+            except pymysql.err.Error as exc:
+                logging.warning(f'Could not roll back MySQL transaction, exception {exc}')
+            raise
+        conn.commit()
+
+
+def close_all():
+    """ Closes all the idle connections of every pool """
+    with _pools_lock:
+        pools = list(_pools.values())
+    for idle_connections, slots in pools:
+        while True:
+            try:
+                conn, idle_since = idle_connections.get_nowait()
+            except queue.Empty:
+                break
+            _close(conn)
+
+
+atexit.register(close_all)
@@ -4,19 +4,27 @@ import web_scraping_players_info
 import build_database
 import to_database_tables
 import twitter_info
+import log_config
+import streaming_pipeline
+import stage_scheduler
 
 
 def caller(year_start, year_end):
-    print('Starting web_scraping_players_stats')
-    web_scraping_players_stats.export_players_stats(year_start, year_end)
-    print('Starting web_scraping_players_info')
-    web_scraping_players_info.export_players_info(year_start, year_end)
-    print('Starting twitter_info')
-    twitter_info.export_players_twitter_data()
-    print('Starting build_database')
-    build_database.build_database_with_tables()
-    print('Starting to_database_tables')
-    to_database_tables.write_to_tables()
+    # each stage runs as soon as the stages it depends on are finished, independent stages run concurrently
+    stages = {
+        'web_scraping_players_stats': (lambda: web_scraping_players_stats.export_players_stats(year_start, year_end),
+                                       []),
+        # reuses the totals tables parsed by the stats stage
+        'web_scraping_players_info': (lambda: web_scraping_players_info.export_players_info(year_start, year_end),
+                                      ['web_scraping_players_stats']),
+        'twitter_info': (twitter_info.export_players_twitter_data, []),
+        'build_database': (build_database.build_database_with_tables, []),
+        'load_teams': (to_database_tables.to_teams_table, ['build_database']),
+        'load_players': (to_database_tables.write_players_tables, ['build_database', 'web_scraping_players_info']),
+        'load_stats': (to_database_tables.write_stats_tables, ['web_scraping_players_stats', 'load_players']),
+        'load_twitter': (to_database_tables.write_twitter_table, ['twitter_info', 'load_players']),
+    }
+    stage_scheduler.run_stages(stages)
 
 
 def generate_data():
@@ -24,9 +32,17 @@ def generate_data():
 
     my_parser.add_argument('year_start', help='year of the season that we will start scraping stats from')
     my_parser.add_argument('year_end', help='year of the season that we will finish scraping stats from')
+    my_parser.add_argument('--debug', action='store_true', help='log row-level details')
+    my_parser.add_argument('--stream', action='store_true',
+                           help='load scraped rows straight into the database without intermediate csv files')
+    my_parser.add_argument('--csv', action='store_true', help='with --stream, also write the csv files')
 
     args = my_parser.parse_args()
-    caller(int(args.year_start), int(args.year_end))
+    log_config.setup_logging(debug=args.debug)
+    if args.stream:
+        streaming_pipeline.run_streaming(int(args.year_start), int(args.year_end), csv_tee=args.csv)
+    else:
+        caller(int(args.year_start), int(args.year_end))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import time
+import zlib
+import hashlib
+import logging
+import datetime
+import threading
+from collections import namedtuple
+import config
+import atomic_file
+
+# response served from the cache, exposes the attributes the scrapers read from a requests response
+CachedResponse = namedtuple('CachedResponse', ['url', 'status_code', 'text'])
+
+_store_lock = threading.Lock()
+# bytes of the compressed bodies in the cache, computed on first store and kept up to date by store and _evict
+_cache_bytes = None
+_season_url_pattern = re.compile(re.escape(config.URL_BEG) + r'(\d{4})_')
+
+
+def _index_path(url):
+    """ Returns the path of the metadata file of an url """
+    url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return os.path.join(config.HTTP_CACHE_DIR, 'index', f'{url_hash}.json')
+
+
+def _object_path(content_hash):
+    """ Returns the path of the compressed body with the given content hash """
+    return os.path.join(config.HTTP_CACHE_DIR, 'objects', content_hash[:2], f'{content_hash}.z')
+
+
+def season_completed(year, today=None):
+    """ Returns True if the season that finished on year is over (no more games will be played) """
+    today = today or datetime.date.today()
+    return year < today.year or (year == today.year and today.month >= 7)
+
+
+def url_ttl(url):
+    """
+    Returns for how many seconds a cached url is fresh
+    :param url: requested url
+    :return: None for immutable pages (completed seasons), else the ttl in seconds
+    """
+    match = _season_url_pattern.match(url)
+    if match:
+        if season_completed(int(match.group(1))):
+            return None
+        return config.HTTP_CACHE_CURRENT_SEASON_TTL
+    return config.HTTP_CACHE_DEFAULT_TTL
+
+
+def get_entry(url):
+    """ Returns the cached metadata of an url, None if the url was never stored """
+    path = _index_path(url)
+    try:
+        with open(path, encoding='utf-8') as file:
+            entry = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not os.path.exists(_object_path(entry['content_hash'])):
+        logging.warning(f'Cache entry for url {url} points to a missing body, ignoring it')
+        return None
+    return entry
+
+
+def is_fresh(url, entry):
+    """ Checks if a cached entry can be served without contacting the server """
+    ttl = url_ttl(url)
+    return ttl is None or time.time() - entry['fetched_at'] < ttl
+
+
+def revalidation_headers(entry):
+    """ Returns the conditional request headers (ETag/Last-Modified) of a cached entry """
+    headers = {}
+    if entry is None:
+        return headers
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def load(url, entry):
+    """
+    Returns the cached body of an url as a CachedResponse and marks it as recently used
+    Raises FileNotFoundError if the entry was evicted since it was read
+    """
+    with open(_object_path(entry['content_hash']), 'rb') as file:
+        body = zlib.decompress(file.read())
+    os.utime(_index_path(url))
+    logging.debug(f'Serving url {url} from cache')
+    return CachedResponse(url, 200, body.decode(entry.get('encoding') or 'utf-8', errors='replace'))
+
+
+def refresh(url, entry):
+    """ Marks a cached entry as fetched now, used after a 304 Not Modified answer """
+    entry['fetched_at'] = time.time()
+    _write_entry(url, entry)
+    logging.debug(f'Cache entry for url {url} revalidated')
+
+
+def store(url, response):
+    """
+    Stores a successful response in the cache, the body is compressed and addressed by its content hash
+    :param url: requested url
+    :param response: requests response with status code 200
+    """
+    global _cache_bytes
+    body = response.content
+    content_hash = hashlib.sha256(body).hexdigest()
+    object_path = _object_path(content_hash)
+    with _store_lock:
+        if _cache_bytes is None:
+            _cache_bytes = _objects_size()
+        previous = get_entry(url)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            compressed = zlib.compress(body)
+            atomic_file.write(object_path, compressed)
+            _cache_bytes += len(compressed)
+        entry = {'url': url,
+                 'content_hash': content_hash,
+                 'encoding': response.encoding,
+                 'etag': response.headers.get('ETag'),
+                 'last_modified': response.headers.get('Last-Modified'),
+                 'fetched_at': time.time()}
+        _write_entry(url, entry)
+        logging.debug(f'Stored url {url} in cache')
+        # the url changed content (current season pages, twitter list, stats api): its old body is dropped
+        if previous is not None and previous['content_hash'] != content_hash:
+            _cache_bytes -= _remove_unreferenced(previous['content_hash'])
+        if _cache_bytes > config.HTTP_CACHE_MAX_BYTES:
+            _evict()
+
+
+def _write_entry(url, entry):
+    """ Saves the metadata of an url """
+    path = _index_path(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_file.write_json(path, entry)
+
+
+def _index_hashes():
+    """ Returns the content hash of every index entry as a list of (last use time, index path, content hash) """
+    index_dir = os.path.join(config.HTTP_CACHE_DIR, 'index')
+    entries = []
+    for name in os.listdir(index_dir):
+        path = os.path.join(index_dir, name)
+        try:
+            with open(path, encoding='utf-8') as file:
+                entries.append((os.path.getmtime(path), path, json.load(file)['content_hash']))
+        except (OSError, ValueError, KeyError):
+            continue
+    return entries
+
+
+def _remove_unreferenced(content_hash):
+    """
+    Deletes the body with the given content hash if no index entry points to it anymore
+    :return: bytes freed
+    """
+    if any(entry_hash == content_hash for _, _, entry_hash in _index_hashes()):
+        return 0
+    try:
+        size = os.path.getsize(_object_path(content_hash))
+        os.remove(_object_path(content_hash))
+    except FileNotFoundError:
+        return 0
+    return size
+
+
+def _objects_size():
+    """ Returns the bytes of all the compressed bodies stored in the cache """
+    total = 0
+    for directory, _, names in os.walk(os.path.join(config.HTTP_CACHE_DIR, 'objects')):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                continue
+    return total
+
+
+def _evict():
+    """
+    Removes the least recently used entries once the cache is larger than HTTP_CACHE_MAX_BYTES
+    Evicts down to HTTP_CACHE_EVICT_TO_RATIO of the budget, so the index is not scanned again on the next stores
+    Bodies that no entry points to are deleted first, they are not part of the cache anymore
+    Called with _store_lock held, only when the tracked size is over the budget
+    """
+    global _cache_bytes
+    entries = _index_hashes()
+    referenced = {content_hash for _, _, content_hash in entries}
+
+    # bodies no entry points to (left by an older version or an interrupted store) are removed first
+    sizes = {}
+    for directory, _, names in os.walk(os.path.join(config.HTTP_CACHE_DIR, 'objects')):
+        for name in names:
+            if not name.endswith('.z'):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                if name[:-len('.z')] in referenced:
+                    sizes[name[:-len('.z')]] = os.path.getsize(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                continue
+    total = sum(sizes.values())
+    _cache_bytes = total
+    if total <= config.HTTP_CACHE_MAX_BYTES:
+        return
+
+    target = config.HTTP_CACHE_MAX_BYTES * config.HTTP_CACHE_EVICT_TO_RATIO
+    references = {}
+    for _, _, content_hash in entries:
+        references[content_hash] = references.get(content_hash, 0) + 1
+    for _, path, content_hash in sorted(entries):
+        if total <= target:
+            break
+        os.remove(path)
+        references[content_hash] -= 1
+        # bodies are shared between urls with the same content, delete only when no url points to it
+        if references[content_hash] == 0 and content_hash in sizes:
+            os.remove(_object_path(content_hash))
+            total -= sizes[content_hash]
+    _cache_bytes = total
+    logging.info(f'Cache evicted down to {total} bytes')
@@ -0,0 +1,126 @@
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+import config
+import http_cache
+
+# shared keep-alive session, one per process
+_session = None
+_session_lock = threading.Lock()
+
+# worker pool used to run fetches concurrently
+_executor = None
+_executor_lock = threading.Lock()
+
+# per-host politeness limits: {host: (semaphore, lock, [time of last request])}
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+
+def get_session():
+    """ Returns the shared requests session, creating it on first use """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=config.FETCH_POOL_SIZE, pool_maxsize=config.FETCH_POOL_SIZE)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+            logging.info(f'HTTP session created with pool size {config.FETCH_POOL_SIZE}')
+        return _session
+
+
+def get_executor():
+    """ Returns the shared worker pool, creating it on first use """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=config.FETCH_MAX_WORKERS, thread_name_prefix='fetch')
+            logging.info(f'Fetch worker pool created with {config.FETCH_MAX_WORKERS} workers')
+        return _executor
+
+
+def _get_host_limits(host):
+    """ Returns the concurrency semaphore, interval lock and last request time holder of a host """
+    with _hosts_lock:
+        if host not in _hosts:
+            _hosts[host] = (threading.BoundedSemaphore(config.FETCH_MAX_CONCURRENCY_PER_HOST),
+                            threading.Lock(),
+                            [0.0])
+        return _hosts[host]
+
+
+def _wait_for_host_slot(host, interval_lock, last_request):
+    """ Sleeps until at least FETCH_MIN_INTERVAL_PER_HOST seconds passed since the last request to host """
+    with interval_lock:
+        wait = last_request[0] + config.FETCH_MIN_INTERVAL_PER_HOST - time.monotonic()
+        if wait > 0:
+            logging.debug(f'Waiting {wait:.2f}s before requesting host {host}')
+            time.sleep(wait)
+        last_request[0] = time.monotonic()
+
+
+def _request(url, headers=None):
+    """ Requests an url through the shared session, respecting the politeness limits of its host """
+    host = urlparse(url).netloc
+    semaphore, interval_lock, last_request = _get_host_limits(host)
+    with semaphore:
+        _wait_for_host_slot(host, interval_lock, last_request)
+        response = get_session().get(url, headers=headers, timeout=config.FETCH_TIMEOUT)
+    logging.debug(f'Response status code is {response.status_code} for url {url}')
+    return response
+
+
+def fetch(url, headers=None, use_cache=config.HTTP_CACHE_ENABLED):
+    """
+    Requests an url, serving it from the on-disk cache when possible
+    Fresh cached pages are returned without network access, stale ones are revalidated with ETag/Last-Modified
+    :param url: url to request
+    :param headers: optional extra request headers
+    :param use_cache: if False always goes to the network and does not store the response
+    :return: requests response or http_cache.CachedResponse
+    """
+    if not use_cache:
+        return _request(url, headers)
+
+    entry = http_cache.get_entry(url)
+    if entry is not None and http_cache.is_fresh(url, entry):
+        cached = _load_cached(url, entry)
+        if cached is not None:
+            return cached
+        entry = None
+
+    request_headers = dict(headers or {})
+    request_headers.update(http_cache.revalidation_headers(entry))
+    response = _request(url, request_headers)
+    if response.status_code == 304 and entry is not None:
+        http_cache.refresh(url, entry)
+        cached = _load_cached(url, entry)
+        if cached is not None:
+            return cached
+        # the body was evicted while revalidating, requests the page again without conditions
+        response = _request(url, headers)
+    if response.status_code == 200:
+        http_cache.store(url, response)
+    return response
+
+
+def _load_cached(url, entry):
+    """ Returns the cached response of an url, None if its body was evicted by another thread in the meantime """
+    try:
+        return http_cache.load(url, entry)
+    except FileNotFoundError:
+        logging.debug(f'Cached body of url {url} was evicted, treating it as a cache miss')
+        return None
+
+
+def submit(func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) on the shared worker pool
+    :return: concurrent.futures.Future with the result of the call
+    """
+    return get_executor().submit(func, *args, **kwargs)
@@ -0,0 +1,66 @@
+import atexit
+import queue
+import time
+import logging
+import logging.handlers
+import config
+
+# background thread that writes the queued records to the log file
+_listener = None
+
+
+def setup_logging(filename=config.LOG_FILENAME, debug=config.LOG_DEBUG):
+    """
+    Configures project-wide logging, records are put on a queue and written to file by a background thread
+    so the scraping and loading loops never wait on disk
+    :param filename: log file name
+    :param debug: if True also logs row-level details (DEBUG level)
+    """
+    global _listener
+    _stop_listener()
+
+    file_handler = logging.FileHandler(filename, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(config.LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.DEBUG if debug else logging.INFO)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler)
+    _listener.start()
+
+
+def _stop_listener():
+    """ Stops the listener once it wrote the queued records and closes its log file, if logging was set up """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+# registered once, the listener of the last setup_logging call is stopped at exit
+atexit.register(_stop_listener)
+
+
+def row_detail_enabled():
+    """ Returns True if row-level log records are wanted (debug mode) """
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+def log_table_summary(table_name, rows_done, rows_dropped, started, action='parsed'):
+    """
+    Logs one summary record for a whole table instead of one record per row
+    :param table_name: name of the table/file processed
+    :param rows_done: number of rows processed successfully
+    :param rows_dropped: number of rows skipped because of errors
+    :param started: time.perf_counter() value taken when the table processing started
+    :param action: verb describing what was done to the rows
+    """
+    elapsed = time.perf_counter() - started
+    # stacklevel=2 so the record shows the function that processed the table
+    logging.info(f'{table_name}: {rows_done} rows {action}, {rows_dropped} rows dropped in {elapsed:.3f}s',
+                 stacklevel=2)
@@ -0,0 +1,135 @@
+import os
+import re
+import json
+import difflib
+import logging
+import threading
+import unicodedata
+import config
+import atomic_file
+
+# name suffixes that one website writes and the other does not
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+
+# persistent {normalized name: player_id}, grows with every season scraped
+# names shared by different players (e.g. 'Gary Payton' and 'Gary Payton II') are ambiguous and stored as None
+_index = None
+_index_lock = threading.Lock()
+
+
+def normalize_name(name):
+    """
+    Returns the matching key of a player name: accents removed, lowercase, no punctuation, no suffixes
+    e.g. 'Luka Dončić' -> 'luka doncic', 'Gary Trent Jr.' -> 'gary trent'
+    """
+    name = unicodedata.normalize('NFKD', str(name))
+    name = ''.join(char for char in name if not unicodedata.combining(char)).lower()
+    tokens = re.sub(r'[^a-z0-9 ]+', ' ', name.replace("'", '').replace('’', '')).split()
+    return ' '.join(token for token in tokens if token not in NAME_SUFFIXES)
+
+
+def _get_index():
+    """ Returns the index, loaded from PLAYER_INDEX_FILE the first time """
+    global _index
+    if _index is None:
+        if os.path.exists(config.PLAYER_INDEX_FILE):
+            with open(config.PLAYER_INDEX_FILE, encoding='utf-8') as file:
+                _index = json.load(file)
+            logging.info(f'Player index loaded with {len(_index)} players')
+        else:
+            _index = {}
+    return _index
+
+
+def _save_index(index):
+    """ Saves the index to PLAYER_INDEX_FILE """
+    atomic_file.write_json(config.PLAYER_INDEX_FILE, index, ensure_ascii=False, sort_keys=True)
+
+
+def _season_keys(df_ids):
+    """
+    Returns the matching keys of the players of a season
+    :param df_ids: DataFrame with 2 columns: player_id and player (name of the player)
+    :return: tuple (dict {normalized name: player_id}, set of normalized names shared by several players)
+    """
+    season_keys = {}
+    ambiguous = set()
+    for player_id, name in zip(df_ids['player_id'], df_ids['player']):
+        key = normalize_name(name)
+        if season_keys.get(key, player_id) != player_id:
+            ambiguous.add(key)
+        season_keys[key] = player_id
+    for key in ambiguous:
+        del season_keys[key]
+    return season_keys, ambiguous
+
+
+def add_players(df_ids):
+    """
+    Adds the players of a season to the persistent index
+    A name already indexed for another player becomes ambiguous and is no longer used to match other seasons
+    :param df_ids: DataFrame with 2 columns: player_id and player (name of the player)
+    :return: tuple (dict {normalized name: player_id} of the season, set of the season names shared by several
+    players of the season)
+    """
+    season_keys, season_ambiguous = _season_keys(df_ids)
+    with _index_lock:
+        index = _get_index()
+        changes = {key: None for key in season_ambiguous if key not in index or index[key] is not None}
+        for key, player_id in season_keys.items():
+            if key not in index:
+                changes[key] = player_id
+            elif index[key] is not None and index[key] != player_id:
+                logging.warning(f'Player name {key} is shared by {index[key]} and {player_id}, it is ambiguous')
+                changes[key] = None
+        if changes:
+            index.update(changes)
+            _save_index(index)
+            logging.info(f'{len(changes)} names added to or updated in the player index')
+    return season_keys, season_ambiguous
+
+
+def _fuzzy_match(key, candidates):
+    """ Returns the closest key in candidates, None if none is similar enough """
+    matches = difflib.get_close_matches(key, candidates, n=1, cutoff=config.PLAYER_INDEX_FUZZY_CUTOFF)
+    return matches[0] if matches else None
+
+
+def match_players(names, df_ids):
+    """
+    Finds the Basketball Reference id of each player name of the NBA website
+    Players of the season (df_ids) are looked up first, then every player ever indexed, then near misses
+    Ambiguous names (shared by several players of the season, or by several indexed players when the name is not
+    one of the season) are left unmatched, they are never matched through the index or by similar name
+    :param names: iterable of player names as written on the NBA website
+    :param df_ids: DataFrame with 2 columns: player_id and player, the players of the season
+    :return: list with the player_id of each name, None for the names that could not be matched
+    """
+    season_keys, season_ambiguous = add_players(df_ids)
+    with _index_lock:
+        index = {key: player_id for key, player_id in _get_index().items() if player_id is not None}
+        index_ambiguous = {key for key, player_id in _get_index().items() if player_id is None}
+
+    player_ids = []
+    unmatched = []
+    ambiguous = []
+    for name in names:
+        key = normalize_name(name)
+        player_id = season_keys.get(key) or index.get(key)
+        if player_id is None and (key in season_ambiguous or key in index_ambiguous):
+            ambiguous.append(name)
+        elif player_id is None:
+            close_key = _fuzzy_match(key, season_keys) or _fuzzy_match(key, index)
+            if close_key is not None:
+                player_id = season_keys.get(close_key) or index[close_key]
+                logging.info(f'Player {name} matched to {player_id} by similar name')
+            else:
+                unmatched.append(name)
+        player_ids.append(player_id)
+
+    if ambiguous:
+        logging.warning(f'{len(ambiguous)} players have a name shared by several players, they are not matched: '
+                        f'{ambiguous}')
+    if unmatched:
+        logging.warning(f'{len(unmatched)} players could not be matched to an id: {unmatched}')
+    return player_ids
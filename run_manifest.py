@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import config
+import atomic_file
+
+_manifest_lock = threading.Lock()
+
+
+def _load():
+    """ Returns the manifest of the previous runs, {unit: entry} """
+    try:
+        with open(config.RUN_MANIFEST_FILE, encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save(manifest):
+    """ Saves the manifest, written to a temporary file first so a crash never corrupts it """
+    atomic_file.write_json(config.RUN_MANIFEST_FILE, manifest, indent=1, sort_keys=True)
+
+
+def file_checksum(path):
+    """ Returns the sha256 of the content of a file """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def part_path(*parts):
+    """ Returns the path of an intermediate result file inside RUN_PARTS_DIR, creating its directory """
+    path = os.path.join(config.RUN_PARTS_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def is_done(unit, paths=(), max_age=None):
+    """
+    Checks if a unit of work was completed in a previous run and its outputs are unchanged
+    :param unit: name of the unit of work, e.g. 'stats:2021_totals'
+    :param paths: output files of the unit, they must exist with the recorded checksums
+    :param max_age: seconds after which a completed unit is stale and must run again, None if it never expires
+    :return: True if the unit can be skipped
+    """
+    with _manifest_lock:
+        entry = _load().get(unit)
+    if entry is None or entry['status'] != 'done':
+        return False
+    if max_age is not None and time.time() - entry['completed_at'] > max_age:
+        logging.info(f'Unit {unit} is stale, running it again')
+        return False
+    for path in paths:
+        if not os.path.exists(path) or file_checksum(path) != entry['checksums'].get(path):
+            logging.info(f'Output {path} of unit {unit} is missing or changed, running it again')
+            return False
+    logging.info(f'Unit {unit} already completed, skipping it')
+    return True
+
+
+def mark_done(unit, paths=()):
+    """
+    Records a unit of work as completed with the checksums of its outputs
+    :param unit: name of the unit of work
+    :param paths: output files of the unit
+    """
+    checksums = {path: file_checksum(path) for path in paths}
+    with _manifest_lock:
+        manifest = _load()
+        manifest[unit] = {'status': 'done', 'completed_at': time.time(), 'checksums': checksums}
+        _save(manifest)
+
+
+def mark_failed(unit, exc):
+    """
+    Records a unit of work as failed, it will run again on the next run
+    :param unit: name of the unit of work
+    :param exc: exception that made the unit fail
+    """
+    with _manifest_lock:
+        manifest = _load()
+        manifest[unit] = {'status': 'failed', 'completed_at': time.time(), 'error': str(exc), 'checksums': {}}
+        _save(manifest)
+    logging.error(f'Unit {unit} failed, exception {exc}')
+
+
+def prune(prefix, keep=()):
+    """
+    Forgets the units of a kind that are not part of the current run and removes their output files,
+    for units keyed by their content (e.g. the twitter batches) that would otherwise pile up run after run
+    :param prefix: prefix of the units to prune, e.g. 'twitter:'
+    :param keep: units of the current run, kept with their outputs
+    :return: number of units removed
+    """
+    keep = set(keep)
+    with _manifest_lock:
+        manifest = _load()
+        stale = [unit for unit in manifest if unit.startswith(prefix) and unit not in keep]
+        for unit in stale:
+            for path in manifest.pop(unit)['checksums']:
+                if os.path.exists(path):
+                    os.remove(path)
+        if stale:
+            _save(manifest)
+    if stale:
+        logging.info(f'Removed {len(stale)} units {prefix} of previous runs')
+    return len(stale)
@@ -0,0 +1,150 @@
+# schema registry of the nba_data database: DDL of the tables, in creation order (see TABLES_DDL)
+# kept free of database dependencies, the scrapers and the columnar dataset import it without a database
+# the statistics ones are also used to derive the schemas of the columnar dataset and the csv row codecs
+PLAYERS_DDL = """CREATE TABLE IF NOT EXISTS players (
+              player_id varchar(100) not null,
+              name varchar(100),
+              primary key (player_id))"""
+
+PLAYERS_INFO_DDL = """CREATE TABLE IF NOT EXISTS players_info (
+              player_id varchar(100) not null,
+              team_id varchar(100),
+              age int,
+              height decimal(18,9),
+              weight decimal(18,9),
+              college varchar(100),
+              country varchar(100),
+              draft_year int,
+              draft_round int,
+              draft_number int,
+              primary key (player_id))"""
+
+TEAMS_DDL = """CREATE TABLE IF NOT EXISTS teams (
+              team_id varchar(100) not null,
+              name varchar(100),
+              primary key (team_id))"""
+
+TWITTER_DETAILS_DDL = """CREATE TABLE IF NOT EXISTS twitter_details (
+              player_id varchar(100) not null,
+              creation_date date,
+              user_name varchar(100),
+              twitter_id varchar(100),
+              followers_count bigint,
+              following_count bigint,
+              tweet_count bigint,
+              listed_count bigint,
+              description varchar(500),
+              primary key (player_id))"""
+
+TWITTER_SNAPSHOTS_DDL = """CREATE TABLE IF NOT EXISTS twitter_snapshots (
+              player_id varchar(100) not null,
+              snapshot_time datetime not null,
+              followers_count bigint,
+              following_count bigint,
+              tweet_count bigint,
+              listed_count bigint,
+              primary key (player_id, snapshot_time))"""
+
+# natural key of a stats row: a player has one row per season and team (plus the TOT row of traded players)
+STATS_KEY_COLUMNS = ['player_id', 'season', 'team_season']
+# secondary indexes of the stats tables, for lookups by season, team and position
+STATS_INDEXES = {'idx_season_team': ['season', 'team_season'],
+                 'idx_team_season': ['team_season', 'season'],
+                 'idx_pos_season': ['pos', 'season']}
+# columns shared by all the stats tables, before their specific statistics
+STATS_COMMON_COLUMNS = ['player_id varchar(100) not null',
+                        'pos varchar(100)',
+                        'team_season varchar(100) not null',
+                        'season int not null',
+                        'g decimal(18,9)',
+                        'gs decimal(18,9)']
+
+
+def stats_ddl(table_name, stat_columns):
+    """
+    Returns the CREATE TABLE statement of a stats table, the tables only differ by their statistics columns
+    :param table_name: name of the stats table
+    :param stat_columns: names of the statistics columns of the table, all of them are decimal
+    """
+    lines = STATS_COMMON_COLUMNS + [f'{column} decimal(18,9)' for column in stat_columns]
+    lines.append(f"primary key ({', '.join(STATS_KEY_COLUMNS)})")
+    lines += [f"key {index_name} ({', '.join(columns)})" for index_name, columns in STATS_INDEXES.items()]
+    lines.append('foreign key (player_id) references players(player_id)')
+    return f'CREATE TABLE IF NOT EXISTS {table_name} (\n              ' + ',\n              '.join(lines) + ')'
+
+
+STATS_PER_GAME_DDL = stats_ddl('stats_per_game', [
+    'mp_per_g', 'fg_per_g', 'fga_per_g', 'fg_pct', 'fg3_per_g', 'fg3a_per_g', 'fg3_pct', 'fg2_per_g', 'fg2a_per_g',
+    'fg2_pct', 'efg_pct', 'ft_per_g', 'fta_per_g', 'ft_pct', 'orb_per_g', 'drb_per_g', 'trb_per_g', 'ast_per_g',
+    'stl_per_g', 'blk_per_g', 'tov_per_g', 'pf_per_g', 'pts_per_g'])
+
+STATS_PER_MINUTE_DDL = stats_ddl('stats_per_minute', [
+    'mp', 'fg_per_mp', 'fga_per_mp', 'fg_pct', 'fg3_per_mp', 'fg3a_per_mp', 'fg3_pct', 'fg2_per_mp', 'fg2a_per_mp',
+    'fg2_pct', 'ft_per_mp', 'fta_per_mp', 'ft_pct', 'orb_per_mp', 'drb_per_mp', 'trb_per_mp', 'ast_per_mp',
+    'stl_per_mp', 'blk_per_mp', 'tov_per_mp', 'pf_per_mp', 'pts_per_mp'])
+
+STATS_PER_POSS_DDL = stats_ddl('stats_per_poss', [
+    'mp', 'fg_per_poss', 'fga_per_poss', 'fg_pct', 'fg3_per_poss', 'fg3a_per_poss', 'fg3_pct', 'fg2_per_poss',
+    'fg2a_per_poss', 'fg2_pct', 'ft_per_poss', 'fta_per_poss', 'ft_pct', 'orb_per_poss', 'drb_per_poss',
+    'trb_per_poss', 'ast_per_poss', 'stl_per_poss', 'blk_per_poss', 'tov_per_poss', 'pf_per_poss', 'pts_per_poss',
+    'off_rtg', 'def_rtg'])
+
+STATS_TOTALS_DDL = stats_ddl('stats_totals', [
+    'mp', 'fg', 'fga', 'fg_pct', 'fg3', 'fg3a', 'fg3_pct', 'fg2', 'fg2a', 'fg2_pct', 'efg_pct', 'ft', 'fta', 'ft_pct',
+    'orb', 'drb', 'trb', 'ast', 'stl', 'blk', 'tov', 'pf', 'pts'])
+
+STATS_TABLES_DDL = {'stats_per_game': STATS_PER_GAME_DDL,
+                    'stats_per_minute': STATS_PER_MINUTE_DDL,
+                    'stats_per_poss': STATS_PER_POSS_DDL,
+                    'stats_totals': STATS_TOTALS_DDL}
+
+TABLES_DDL = {'players': PLAYERS_DDL,
+              'players_info': PLAYERS_INFO_DDL,
+              'teams': TEAMS_DDL,
+              **STATS_TABLES_DDL,
+              'twitter_details': TWITTER_DETAILS_DDL,
+              'twitter_snapshots': TWITTER_SNAPSHOTS_DDL}
+
+# version of the schema applied to the database, one row per migration
+SCHEMA_VERSION_DDL = """CREATE TABLE IF NOT EXISTS schema_version (
+              version int not null,
+              description varchar(200),
+              applied_at datetime,
+              primary key (version))"""
+
+
+def table_columns(ddl):
+    """
+    Extracts the columns of a CREATE TABLE statement
+    :param ddl: CREATE TABLE statement
+    :return: list of tuples (column name, sql type)
+    """
+    columns = []
+    for line in ddl[ddl.index('(') + 1:].splitlines():
+        line = line.strip().rstrip(',')
+        name = line.split(' ')[0].lower() if line else ''
+        if name in ('', 'primary', 'foreign', 'unique', 'key', 'index', 'partition'):
+            continue
+        columns.append((name, line.split(' ')[1].lower()))
+    return columns
+
+
+def primary_key_columns(ddl):
+    """
+    Returns the names of the primary key columns of a CREATE TABLE statement
+    :param ddl: CREATE TABLE statement
+    """
+    for line in ddl[ddl.index('(') + 1:].splitlines():
+        line = line.strip()
+        if line.lower().startswith('primary key'):
+            return [column.strip() for column in line[line.index('(') + 1:line.index(')')].split(',')]
+    return []
+
+
+def required_columns(ddl):
+    """
+    Returns the names of the not null columns of a CREATE TABLE statement
+    :param ddl: CREATE TABLE statement
+    """
+    return [line.strip().split(' ')[0].lower() for line in ddl[ddl.index('(') + 1:].splitlines()
+            if 'not null' in line.lower()]
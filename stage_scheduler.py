@@ -0,0 +1,103 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import config
+
+
+def _check_stages(stages):
+    """ Raises ValueError if a stage depends on an unknown stage or if the dependencies contain a cycle """
+    for name, (_, dependencies) in stages.items():
+        for dependency in dependencies:
+            if dependency not in stages:
+                raise ValueError(f'Stage {name} depends on unknown stage {dependency}')
+
+    visited = set()
+    for name in stages:
+        path = set()
+        stack = [(name, False)]
+        while stack:
+            node, leaving = stack.pop()
+            if leaving:
+                path.discard(node)
+                visited.add(node)
+                continue
+            if node in path:
+                raise ValueError(f'Stages dependencies contain a cycle through {node}')
+            if node in visited:
+                continue
+            path.add(node)
+            stack.append((node, True))
+            stack.extend((dependency, False) for dependency in stages[node][1])
+
+
+def critical_path(stages, timings):
+    """
+    Returns the chain of dependent stages with the longest total run time
+    :param stages: dict {stage name: (function, list of dependencies)}
+    :param timings: dict {stage name: (start time, end time)} of the stages that finished
+    :return: tuple (list of stage names in run order, total seconds)
+    """
+    longest = {}
+
+    def chain(name):
+        if name not in longest:
+            duration = timings[name][1] - timings[name][0]
+            previous = [chain(dependency) for dependency in stages[name][1] if dependency in timings]
+            best = max(previous, key=lambda item: item[1], default=([], 0.0))
+            longest[name] = (best[0] + [name], best[1] + duration)
+        return longest[name]
+
+    return max((chain(name) for name in timings), key=lambda item: item[1], default=([], 0.0))
+
+
+def run_stages(stages, max_workers=config.SCHEDULER_MAX_WORKERS):
+    """
+    Runs stages concurrently, each one as soon as all its dependencies finished successfully
+    Stages whose dependencies failed are skipped
+    :param stages: dict {stage name: (function without arguments, list of dependencies)}
+    :param max_workers: maximum number of stages running at the same time
+    :return: dict {stage name: (start time, end time)} of the stages that finished
+    """
+    _check_stages(stages)
+    timings = {}
+    failed = {}
+    done = set()
+    running = {}
+    waiting = dict(stages)
+
+    def run(name, func):
+        start = time.perf_counter()
+        func()
+        return start, time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stage') as executor:
+        while waiting or running:
+            for name, (func, dependencies) in list(waiting.items()):
+                if any(dependency in failed for dependency in dependencies):
+                    failed[name] = 'dependency failed'
+                    del waiting[name]
+                    logging.error(f'Stage {name} skipped, one of its dependencies failed')
+                elif all(dependency in done for dependency in dependencies):
+                    print(f'Starting {name}')
+                    logging.info(f'Stage {name} started')
+                    running[executor.submit(run, name, func)] = name
+                    del waiting[name]
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    timings[name] = future.result()
+                    done.add(name)
+                    logging.info(f'Stage {name} finished in {timings[name][1] - timings[name][0]:.1f}s')
+                except Exception as exc:
+                    failed[name] = exc
+                    print(f'Stage {name} failed: {exc}')
+                    logging.critical(f'Stage {name} failed, exception {exc}')
+
+    path, total = critical_path(stages, timings)
+    print(f'Critical path: {" -> ".join(path)} ({total:.1f}s)')
+    logging.info(f'Critical path: {" -> ".join(path)} ({total:.1f}s)')
+    if failed:
+        raise Exception(f'Stages failed: {", ".join(failed)}')
+    return timings
@@ -0,0 +1,132 @@
+import queue
+import threading
+import logging
+import pandas as pd
+import config
+import build_database
+import to_database_tables
+import twitter_info
+import web_scraping_players_info
+import web_scraping_players_stats
+import columnar_store
+
+# marks the end of a stream on the queue
+_END_OF_STREAM = object()
+
+
+def bounded_stream(items, maxsize=config.STREAM_QUEUE_SIZE):
+    """
+    Consumes a generator on a background thread through a bounded queue, so production (scraping) and
+    consumption (database loading) overlap while at most maxsize items wait in memory
+    :param items: iterable to consume
+    :param maxsize: maximum number of items waiting to be consumed
+    :return: generator with the same items, exceptions of the producer are raised on the consumer side
+    """
+    items_queue = queue.Queue(maxsize=maxsize)
+
+    def produce():
+        try:
+            for item in items:
+                items_queue.put(item)
+        except Exception as exc:
+            logging.critical(f'Stream producer failed, exception {exc}')
+            items_queue.put(exc)
+        finally:
+            items_queue.put(_END_OF_STREAM)
+
+    threading.Thread(target=produce, name='stream-producer', daemon=True).start()
+    while True:
+        item = items_queue.get()
+        if item is _END_OF_STREAM:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def _records(df):
+    """ Converts a DataFrame to a list of dicts with '' for missing values, the same values read from its csv """
+    return df.astype(object).where(df.notna(), '').to_dict('records')
+
+
+def _stats_records(parsed_table):
+    """
+    Returns the rows of a scraped stats table as dicts of strings, the typed DataFrame of the columnar mode is
+    formatted the way its csv is written so both modes load the same values
+    """
+    if not isinstance(parsed_table, pd.DataFrame):
+        return parsed_table
+    return parsed_table.astype(str).where(parsed_table.notna(), '').to_dict('records')
+
+
+def stream_stats_to_db(year_start, year_end, csv_tee=False):
+    """
+    Loads the scraped statistics straight into the stats tables, without intermediate csv files
+    Players of each table are inserted first (existing ones are skipped) so the foreign keys are satisfied
+    :param year_start: first season to scrape
+    :param year_end: last season to scrape
+    :param csv_tee: if True also writes the sample_*.csv files
+    """
+    stream = bounded_stream(web_scraping_players_stats.iter_players_stats(year_start, year_end))
+    for year, ext, parsed_table in stream:
+        stat_type = ext.split('.')[0]
+        if csv_tee:
+            web_scraping_players_stats.export_data_to_csv(year, parsed_table, stat_type)
+        if config.DATASET_OUTPUT:
+            columnar_store.write_stats_partition(parsed_table, year, stat_type)
+
+        rows = _stats_records(parsed_table)
+        players = {row['player_id']: row['player'] for row in rows}
+        to_database_tables.insert_tuple_to_db(list(players.items()), table_name='players', ignore_duplicates=True)
+
+        to_database_tables.load_stats_rows(rows, year, stat_type[1:])
+        logging.info(f'Stats {stat_type} for year {year} streamed to the database')
+
+
+def stream_players_info_to_db(year_start, year_end, csv_tee=False):
+    """
+    Loads the scraped players details straight into the players and players_info tables
+    :param year_start: first season to scrape
+    :param year_end: last season to scrape
+    :param csv_tee: if True also writes players_info.csv and players_id.csv
+    """
+    df_nba_players_info, df_ids = web_scraping_players_info.collect_players_info(year_start, year_end)
+    if csv_tee:
+        df_nba_players_info.to_csv('players_info.csv', index=None)
+        df_ids.to_csv('players_id.csv', index=None)
+    to_database_tables.load_players_rows(_records(df_ids), table_name='players')
+    to_database_tables.load_players_rows(_records(df_nba_players_info), table_name='players_info')
+    logging.info('Players details streamed to the database')
+
+
+def stream_twitter_to_db(csv_tee=False):
+    """
+    Loads the players twitter details and metrics snapshots straight into the twitter_details and twitter_snapshots
+    tables
+    :param csv_tee: if True also writes twitter_details.csv and appends to the snapshots file
+    """
+    df_info, df_snapshots = twitter_info.collect_players_twitter_data()
+    if csv_tee:
+        df_info.to_csv('twitter_details.csv', index=None)
+        twitter_info.append_snapshots(df_snapshots)
+    to_database_tables.load_twitter_rows(_records(df_info))
+    to_database_tables.load_twitter_snapshot_rows(_records(df_snapshots))
+    logging.info('Players twitter details streamed to the database')
+
+
+def run_streaming(year_start, year_end, csv_tee=False):
+    """
+    Runs the whole pipeline in streaming mode: scraped rows go straight to the database loaders
+    :param year_start: first season to scrape
+    :param year_end: last season to scrape
+    :param csv_tee: if True also writes the csv files of the batch mode
+    """
+    print('Starting build_database')
+    build_database.build_database_with_tables()
+    to_database_tables.to_teams_table()
+    print('Starting streaming of players stats')
+    stream_stats_to_db(year_start, year_end, csv_tee)
+    print('Starting streaming of players info')
+    stream_players_info_to_db(year_start, year_end, csv_tee)
+    print('Starting streaming of twitter info')
+    stream_twitter_to_db(csv_tee)
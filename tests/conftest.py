@@ -0,0 +1,44 @@
+import os
+import sys
+import pytest
+
+# the project modules live at the repository root, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import db_pool
+import build_database
+
+
+def use_embedded_backend(monkeypatch, tmp_path, backend):
+    """ Points the database to a file of the test directory, which becomes the working directory of the test """
+    monkeypatch.setattr(config, 'DB_BACKEND', backend)
+    monkeypatch.setattr(config, 'DB_LOCAL_PATH', str(tmp_path / config.DB_LOCAL_DEFAULT_PATHS[backend]))
+    monkeypatch.setattr(db_pool, '_pools', {})
+    monkeypatch.chdir(tmp_path)
+    return config.DB_LOCAL_PATH
+
+
+@pytest.fixture
+def sqlite_backend(monkeypatch, tmp_path):
+    """ Points the database to a SQLite file of the test directory """
+    yield use_embedded_backend(monkeypatch, tmp_path, 'sqlite')
+    db_pool.close_all()
+
+
+@pytest.fixture
+def sqlite_database(sqlite_backend):
+    """ Builds the nba_data schema in the SQLite file of sqlite_backend """
+    build_database.build_database_with_tables()
+    return sqlite_backend
+
+
+@pytest.fixture(params=['sqlite', 'duckdb'])
+def embedded_database(request, monkeypatch, tmp_path):
+    """ Builds the nba_data schema in a SQLite or a DuckDB file of the test directory """
+    if request.param == 'duckdb':
+        pytest.importorskip('duckdb')
+    path = use_embedded_backend(monkeypatch, tmp_path, request.param)
+    build_database.build_database_with_tables()
+    yield path
+    db_pool.close_all()
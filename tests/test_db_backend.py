@@ -0,0 +1,34 @@
+import pytest
+import config
+import build_database
+import db_backend
+import db_pool
+
+
+def count_players():
+    with db_pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM players')
+        return cursor.fetchone()[0]
+
+
+def test_connections_follow_the_database_file(monkeypatch, tmp_path, embedded_database):
+    with db_pool.transaction() as connection, connection.cursor() as cursor:
+        cursor.execute("INSERT INTO players VALUES ('jamesle01', 'LeBron James')")
+
+    monkeypatch.setattr(config, 'DB_LOCAL_PATH', str(tmp_path / f'other.{config.DB_BACKEND}'))
+    build_database.build_database_with_tables()
+    assert count_players() == 0
+
+    monkeypatch.setattr(config, 'DB_LOCAL_PATH', embedded_database)
+    assert count_players() == 1
+
+
+def test_duckdb_connections_are_opened_per_file(tmp_path, monkeypatch):
+    pytest.importorskip('duckdb')
+    monkeypatch.setattr(config, 'DB_BACKEND', 'duckdb')
+    first = db_backend.connect(str(tmp_path / 'first.duckdb'))
+    second = db_backend.connect(str(tmp_path / 'second.duckdb'))
+    first.raw.execute('CREATE TABLE only_in_first (id int)')
+
+    assert second.raw.execute("SELECT COUNT(*) FROM information_schema.tables "
+                              "WHERE table_name = 'only_in_first'").fetchone() == (0,)
@@ -0,0 +1,60 @@
+import os
+from types import SimpleNamespace
+import pytest
+import config
+import http_cache
+
+SEASON_URL = f'{config.URL_BEG}2099_totals.html'
+
+
+def disk_bytes():
+    """ Returns the bytes of the bodies stored under the cache objects directory """
+    total = 0
+    for directory, _, names in os.walk(os.path.join(config.HTTP_CACHE_DIR, 'objects')):
+        total += sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+    return total
+
+
+def response(body):
+    return SimpleNamespace(content=body, encoding='utf-8', headers={})
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'HTTP_CACHE_DIR', str(tmp_path / 'http_cache'))
+    monkeypatch.setattr(config, 'HTTP_CACHE_MAX_BYTES', 5000)
+    monkeypatch.setattr(http_cache, '_cache_bytes', None)
+    return http_cache
+
+
+def test_new_content_of_an_url_replaces_its_old_body(cache):
+    for version in range(300):
+        cache.store(SEASON_URL, response(os.urandom(200) + f'version {version}'.encode('utf-8')))
+
+    entry = cache.get_entry(SEASON_URL)
+    assert cache.load(SEASON_URL, entry).text.endswith('version 299')
+    assert disk_bytes() == cache._cache_bytes
+    assert disk_bytes() <= config.HTTP_CACHE_MAX_BYTES
+
+
+def test_bodies_shared_by_other_urls_are_kept(cache):
+    cache.store(SEASON_URL, response(b'same page'))
+    cache.store(f'{config.URL_BEG}2098_totals.html', response(b'same page'))
+    cache.store(SEASON_URL, response(b'new page'))
+
+    assert cache.load(f'{config.URL_BEG}2098_totals.html',
+                      cache.get_entry(f'{config.URL_BEG}2098_totals.html')).text == 'same page'
+
+
+def test_eviction_removes_unreferenced_bodies_and_bounds_disk_use(cache):
+    cache.store(SEASON_URL, response(b'current page'))
+    orphan = cache._object_path('0' * 64)
+    os.makedirs(os.path.dirname(orphan), exist_ok=True)
+    with open(orphan, 'wb') as file:
+        file.write(os.urandom(3000))
+    for page in range(40):
+        cache.store(f'{config.URL_BEG}{1950 + page}_totals.html', response(os.urandom(300)))
+
+    assert not os.path.exists(orphan)
+    assert disk_bytes() == cache._cache_bytes
+    assert disk_bytes() <= config.HTTP_CACHE_MAX_BYTES
@@ -0,0 +1,197 @@
+import os
+from contextlib import contextmanager
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+import config
+import db_pool
+import http_cache
+import http_fetcher
+import to_database_tables
+import twitter_info
+import web_scraping_players_stats
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+@pytest.fixture
+def totals_2021(monkeypatch):
+    """ Returns the parsed rows of the saved 2021 totals page """
+    def fetch(url, headers=None, use_cache=True):
+        with open(os.path.join(FIXTURES_DIR, url.rsplit('/', 1)[-1]), encoding='utf-8') as file:
+            return http_cache.CachedResponse(url, 200, file.read())
+    monkeypatch.setattr(http_fetcher, 'fetch', fetch)
+    return web_scraping_players_stats.parse_html(web_scraping_players_stats.get_html(2021, '_totals.html'))
+
+
+def write_sample(rows, columnar):
+    """ Saves the rows as sample_2021_totals.csv, with the csv module or with pandas (columnar mode) """
+    table = web_scraping_players_stats.parse_html_columnar(
+        web_scraping_players_stats.get_html(2021, '_totals.html')) if columnar else rows
+    return web_scraping_players_stats.export_data_to_csv(2021, table, '_totals')
+
+
+def query(sql):
+    with db_pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchall()
+
+
+def load_players(rows):
+    to_database_tables.load_players_rows(({'player_id': row['player_id'], 'player': row['player']} for row in rows),
+                                         'players')
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_both_csv_flavours_are_loaded(embedded_database, totals_2021, columnar):
+    load_players(totals_2021)
+    filename = write_sample(totals_2021, columnar)
+    to_database_tables.to_stats_table(filename)
+
+    assert query('SELECT COUNT(*), SUM(pts) FROM stats_totals WHERE season = 2021')[0] == \
+        (len(totals_2021), sum(int(row['pts']) for row in totals_2021))
+
+
+def test_loading_a_stats_file_again_updates_its_rows(embedded_database, totals_2021):
+    load_players(totals_2021)
+    to_database_tables.to_stats_table(write_sample(totals_2021, columnar=False))
+    first_load = query('SELECT COUNT(*), SUM(pts) FROM stats_totals')[0]
+    to_database_tables.to_stats_table(write_sample(totals_2021, columnar=False))
+    assert query('SELECT COUNT(*), SUM(pts) FROM stats_totals')[0] == first_load
+
+    corrected = [{**row, 'pts': '2000'} if row['player_id'] == totals_2021[0]['player_id'] else row
+                 for row in totals_2021]
+    to_database_tables.to_stats_table(write_sample(corrected, columnar=False))
+    assert query('SELECT COUNT(*) FROM stats_totals')[0] == (len(totals_2021),)
+    assert query(f"SELECT pts FROM stats_totals WHERE player_id = '{totals_2021[0]['player_id']}'")[0] == (2000,)
+
+
+def test_loading_players_again_updates_their_names(embedded_database):
+    to_database_tables.load_players_rows([{'player_id': 'paytoga02', 'player': 'Gary Payton'}], 'players')
+    to_database_tables.load_players_rows([{'player_id': 'paytoga02', 'player': 'Gary Payton II'},
+                                          {'player_id': 'paytoga01', 'player': 'Gary Payton'}], 'players')
+
+    assert sorted(query('SELECT player_id, name FROM players')) == [('paytoga01', 'Gary Payton'),
+                                                                   ('paytoga02', 'Gary Payton II')]
+
+
+def test_loading_twitter_details_again_refreshes_the_metrics(embedded_database):
+    details = {'player_id': 'jamesle01', 'creation_date': '2009-06-01', 'user_name': 'KingJames', 'twitter_id': '1',
+               'followers_count': '100', 'following_count': '1', 'tweet_count': '3', 'listed_count': '5',
+               'description': ''}
+    to_database_tables.load_twitter_rows([details])
+    to_database_tables.load_twitter_rows([{**details, 'followers_count': '150'}])
+
+    assert query('SELECT COUNT(*), SUM(followers_count) FROM twitter_details')[0] == (1, 150)
+
+
+class LoadDataServer:
+    """ Stand-in of the MySQL server for LOAD DATA: records the statements and answers with the set info message """
+
+    def __init__(self):
+        self.statements = []
+        self.message = b''
+        self.affected_rows = 0
+
+
+@pytest.fixture
+def infile_server(monkeypatch):
+    """ Switches to the LOAD DATA mode on a stand-in MySQL connection """
+    server = LoadDataServer()
+
+    class Cursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def execute(self, sql, args=None):
+            server.statements.append(sql)
+            self._result = SimpleNamespace(message=server.message)
+            return server.affected_rows
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+    @contextmanager
+    def transaction():
+        yield Connection()
+    monkeypatch.setattr(config, 'DB_LOAD_MODE', 'infile')
+    monkeypatch.setattr(db_pool, 'transaction', transaction)
+    return server
+
+
+@pytest.mark.parametrize('columnar, terminator', [(False, r"'\r\n'"), (True, r"'\n'")])
+def test_infile_load_uses_the_line_terminator_of_the_file(monkeypatch, tmp_path, totals_2021, infile_server,
+                                                          columnar, terminator):
+    monkeypatch.chdir(tmp_path)
+    infile_server.message = f'Records: {len(totals_2021)}  Deleted: 0  Skipped: 0  Warnings: 0'.encode('utf-8')
+    to_database_tables.to_stats_table(write_sample(totals_2021, columnar))
+
+    assert f'LINES TERMINATED BY {terminator}' in infile_server.statements[0]
+
+
+def test_infile_load_reports_the_rows_the_server_loaded(monkeypatch, tmp_path, totals_2021, infile_server):
+    monkeypatch.chdir(tmp_path)
+    rates = []
+    monkeypatch.setattr(to_database_tables, 'log_load_rate', lambda table_name, rows, started: rates.append(rows))
+    # REPLACE counts the replaced rows twice in the affected rows, the info message has the loaded records
+    infile_server.message = b'Records: 13  Deleted: 3  Skipped: 1  Warnings: 0'
+    infile_server.affected_rows = 16
+    to_database_tables.to_stats_table(write_sample(totals_2021, columnar=False))
+
+    assert rates == [12]
+
+
+def test_infile_load_of_no_rows_fails(monkeypatch, tmp_path, totals_2021, infile_server):
+    monkeypatch.chdir(tmp_path)
+    infile_server.message = b'Records: 0  Deleted: 0  Skipped: 0  Warnings: 0'
+    with pytest.raises(ValueError, match='No rows'):
+        to_database_tables.to_stats_table(write_sample(totals_2021, columnar=False))
+
+
+def write_drifted_sample(rows):
+    """ Saves the rows with a column the stats table does not have """
+    return web_scraping_players_stats.export_data_to_csv(2021, [{**row, 'new_stat': '1'} for row in rows], '_totals')
+
+
+def test_insert_load_rejects_a_drifted_csv(sqlite_database, totals_2021):
+    load_players(totals_2021)
+    with pytest.raises(ValueError, match='new_stat'):
+        to_database_tables.to_stats_table(write_drifted_sample(totals_2021))
+    assert query('SELECT COUNT(*) FROM stats_totals')[0] == (0,)
+
+
+def test_infile_load_rejects_a_drifted_csv(monkeypatch, tmp_path, totals_2021, infile_server):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError, match='new_stat'):
+        to_database_tables.to_stats_table(write_drifted_sample(totals_2021))
+    assert infile_server.statements == []
+
+
+def test_only_the_snapshots_of_the_last_run_are_loaded(monkeypatch, sqlite_database):
+    loaded = []
+    insert_tuple_to_db = to_database_tables.insert_tuple_to_db
+
+    def record_insert(tup_list, table_name, **kwargs):
+        loaded.append((table_name, len(tup_list)))
+        insert_tuple_to_db(tup_list, table_name, **kwargs)
+    monkeypatch.setattr(to_database_tables, 'insert_tuple_to_db', record_insert)
+
+    for snapshot_time in ['2022-01-01 00:00:00', '2022-01-08 00:00:00', '2022-01-15 00:00:00']:
+        details = pd.DataFrame({'player_id': ['jamesle01', 'curryst01'], 'creation_date': ['2009-06-01'] * 2,
+                                'user_name': ['KingJames', 'StephenCurry30'], 'twitter_id': ['1', '2'],
+                                'followers_count': [100, 200], 'following_count': [1, 2], 'tweet_count': [3, 4],
+                                'listed_count': [5, 6], 'description': ['', '']},
+                               columns=twitter_info.TWITTER_COLUMNS)
+        snapshots = details[['player_id'] + twitter_info.TWITTER_COUNT_COLUMNS].copy()
+        snapshots.insert(1, 'snapshot_time', snapshot_time)
+        monkeypatch.setattr(twitter_info, 'collect_players_twitter_data', lambda: (details, snapshots))
+        twitter_info.export_players_twitter_data()
+        to_database_tables.write_twitter_table()
+
+    assert [count for table_name, count in loaded if table_name == 'twitter_snapshots'] == [2, 2, 2]
+    assert query('SELECT COUNT(*) FROM twitter_snapshots')[0] == (6,)
+    assert len(pd.read_csv(config.TWITTER_SNAPSHOTS_FILE)) == 6
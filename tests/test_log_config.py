@@ -0,0 +1,39 @@
+import logging
+import pytest
+import log_config
+
+
+@pytest.fixture
+def root_logger():
+    """ Restores the handlers and level of the root logger replaced by setup_logging """
+    root = logging.getLogger()
+    handlers, level = root.handlers, root.level
+    yield root
+    log_config._stop_listener()
+    root.handlers, root.level = handlers, level
+
+
+def read(path):
+    with open(path, encoding='utf-8') as file:
+        return file.read()
+
+
+def test_setup_logging_again_switches_the_log_file(root_logger, tmp_path):
+    log_config.setup_logging(str(tmp_path / 'first.log'))
+    logging.info('first record')
+    first_handler = log_config._listener.handlers[0]
+    log_config.setup_logging(str(tmp_path / 'second.log'))
+    logging.info('second record')
+    log_config._stop_listener()
+
+    assert first_handler.stream is None
+    assert 'first record' in read(tmp_path / 'first.log') and 'second record' not in read(tmp_path / 'first.log')
+    assert 'second record' in read(tmp_path / 'second.log')
+
+
+def test_stopping_twice_is_harmless(root_logger, tmp_path):
+    log_config.setup_logging(str(tmp_path / 'run.log'))
+    log_config._stop_listener()
+    log_config._stop_listener()
+
+    assert log_config._listener is None
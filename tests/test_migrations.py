@@ -0,0 +1,58 @@
+import pytest
+import build_database
+import db_backend
+import db_pool
+import schema
+
+PLAYERS_WITH_NICKNAME_DDL = schema.PLAYERS_DDL.replace('name varchar(100),', 'name varchar(100),\n'
+                                                       '              nickname varchar(100),')
+# migration of a schema change made after the first release: a new column in the registry DDL
+ADD_NICKNAME = (3, 'players nickname', [build_database.add_columns('players', ['nickname'])])
+
+
+@pytest.fixture
+def nickname_release(monkeypatch):
+    """ Releases a version of the registry where players has a nickname column, added by migration 3 """
+    def release():
+        monkeypatch.setitem(build_database.TABLES_DDL, 'players', PLAYERS_WITH_NICKNAME_DDL)
+        monkeypatch.setattr(build_database, 'SCHEMA_MIGRATIONS', build_database.SCHEMA_MIGRATIONS + [ADD_NICKNAME])
+        monkeypatch.setattr(build_database, 'SCHEMA_VERSION', 3)
+    return release
+
+
+def schema_state():
+    """ Returns the applied migrations and the live columns of players """
+    with db_pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute('SELECT version FROM schema_version ORDER BY version')
+        versions = [row[0] for row in cursor.fetchall()]
+        return versions, db_backend.live_columns(cursor, None, 'players')
+
+
+def test_new_database_is_created_at_the_latest_version(sqlite_backend, nickname_release):
+    nickname_release()
+    build_database.build_database_with_tables()
+
+    assert schema_state() == ([1, 2, 3], {'player_id', 'name', 'nickname'})
+
+
+def test_v1_database_is_upgraded(monkeypatch, sqlite_backend, nickname_release):
+    with monkeypatch.context() as first_release:
+        first_release.setattr(build_database, 'SCHEMA_MIGRATIONS', build_database.SCHEMA_MIGRATIONS[:1])
+        first_release.setattr(build_database, 'SCHEMA_VERSION', 1)
+        build_database.build_database_with_tables()
+    with db_pool.transaction() as connection, connection.cursor() as cursor:
+        cursor.execute("INSERT INTO players VALUES ('jamesle01', 'LeBron James')")
+    assert schema_state() == ([1], {'player_id', 'name'})
+
+    nickname_release()
+    build_database.build_database_with_tables()
+
+    assert schema_state() == ([1, 2, 3], {'player_id', 'name', 'nickname'})
+    with db_pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute('SELECT player_id, name, nickname FROM players')
+        assert cursor.fetchall() == [('jamesle01', 'LeBron James', None)]
+
+
+def test_up_to_date_database_is_left_as_is(sqlite_database):
+    assert build_database.migrate(None, None, None, 'nba_data') == build_database.SCHEMA_VERSION
+    assert schema_state()[0] == [1, 2]
@@ -0,0 +1,58 @@
+import json
+import pandas as pd
+import pytest
+import config
+import player_index
+
+
+@pytest.fixture
+def index_file(monkeypatch, tmp_path):
+    """ Starts every test with an empty player index saved in the test directory """
+    monkeypatch.setattr(config, 'PLAYER_INDEX_FILE', str(tmp_path / 'player_index.json'))
+    monkeypatch.setattr(player_index, '_index', None)
+    return config.PLAYER_INDEX_FILE
+
+
+def season(*players):
+    return pd.DataFrame(players, columns=['player_id', 'player'])
+
+
+PAYTON_2005 = season(('paytoga01', 'Gary Payton'), ('jamesle01', 'LeBron James'))
+PAYTON_2021 = season(('paytoga02', 'Gary Payton II'), ('jamesle01', 'LeBron James'))
+OTHER_SEASON = season(('jamesle01', 'LeBron James'), ('doncilu01', 'Luka Dončić'))
+
+
+def test_father_and_son_match_their_own_season(index_file):
+    assert player_index.match_players(['Gary Payton'], PAYTON_2005) == ['paytoga01']
+    assert player_index.match_players(['Gary Payton II'], PAYTON_2021) == ['paytoga02']
+    # the 2005 season is scraped again once the shared name is known to be ambiguous
+    assert player_index.match_players(['Gary Payton', 'LeBron James'], PAYTON_2005) == ['paytoga01', 'jamesle01']
+
+    with open(index_file, encoding='utf-8') as file:
+        assert json.load(file)['gary payton'] is None
+
+
+def test_shared_name_is_not_matched_outside_its_seasons(index_file):
+    player_index.match_players([], PAYTON_2005)
+    player_index.match_players([], PAYTON_2021)
+
+    assert player_index.match_players(['Gary Payton II', 'Gary Payton', 'Luka Doncic'], OTHER_SEASON) == \
+        [None, None, 'doncilu01']
+
+
+def test_near_miss_of_a_shared_name_is_not_matched(index_file):
+    player_index.match_players([], PAYTON_2005)
+    player_index.match_players([], PAYTON_2021)
+
+    assert player_index.match_players(['Gary Paytonn'], OTHER_SEASON) == [None]
+
+
+def test_near_miss_of_a_unique_name_is_matched(index_file):
+    assert player_index.match_players(['Luka Doncicc'], OTHER_SEASON) == ['doncilu01']
+
+
+def test_two_players_with_the_same_name_in_a_season_are_not_matched(index_file):
+    smiths = season(('smithch01', 'Chris Smith'), ('smithch02', 'Chris Smith'), ('jamesle01', 'LeBron James'))
+
+    assert player_index.match_players(['Chris Smith', 'LeBron James'], smiths) == [None, 'jamesle01']
+    assert player_index.match_players(['Chris Smith'], OTHER_SEASON) == [None]
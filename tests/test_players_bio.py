@@ -0,0 +1,160 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import pytest
+import config
+import player_index
+import webdriver_pool
+import web_scraping_players_info
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+# recorded answer of the stats API for the 2020-21 regular season
+BIO_PAYLOAD = 'leaguedashplayerbiostats_2020-21.json'
+# columns of players_info.csv, in the order they are saved
+PLAYERS_INFO_COLUMNS = ['player_id', 'team', 'age', 'height', 'weight', 'college', 'country', 'draft_year',
+                        'draft_round', 'draft_number']
+SEASON_IDS = pd.DataFrame({'player_id': ['achiupr01', 'adamsst01', 'antetgi01', 'doncilu01', 'jokicni01',
+                                         'paytoga02', 'porteot01'],
+                           'player': ['Precious Achiuwa', 'Steven Adams', 'Giannis Antetokounmpo', 'Luka Dončić',
+                                      'Nikola Jokić', 'Gary Payton II', 'Otto Porter Jr.']})
+
+
+class StatsApiHandler(BaseHTTPRequestHandler):
+    """ Serves the recorded bio payload on /stats/leaguedashplayerbiostats, any other path fails """
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        StatsApiHandler.requests.append((url.path, parse_qs(url.query), dict(self.headers)))
+        if url.path != '/stats/leaguedashplayerbiostats':
+            self.send_error(500)
+            return
+        with open(os.path.join(FIXTURES_DIR, BIO_PAYLOAD), 'rb') as file:
+            body = file.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stats_api(monkeypatch, tmp_path):
+    """ Starts the local stand-in of the stats API, returns its base url """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StatsApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StatsApiHandler.requests = []
+    monkeypatch.setattr(config, 'HTTP_CACHE_DIR', str(tmp_path / 'http_cache'))
+    monkeypatch.setattr(config, 'FETCH_MIN_INTERVAL_PER_HOST', 0)
+    monkeypatch.setattr(config, 'PLAYER_INDEX_FILE', str(tmp_path / 'player_index.json'))
+    monkeypatch.setattr(player_index, '_index', None)
+    yield f'http://127.0.0.1:{server.server_port}/stats'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def website_table(monkeypatch):
+    """ Replaces the selenium scraping of the NBA website, records the calls """
+    calls = []
+
+    def run_with_driver(func):
+        calls.append(func)
+        return pd.DataFrame({'Player': ['Steven Adams'], 'Team': ['NOP'], 'Age': [27], 'Height': ['6-11'],
+                             'Weight': [265], 'College': ['Pittsburgh'], 'Country': ['New Zealand'],
+                             'Draft Year': [2013], 'Draft Round': [1], 'Draft Number': [12]})
+    monkeypatch.setattr(webdriver_pool, 'run_with_driver', run_with_driver)
+    return calls
+
+
+def test_bio_json_has_the_website_table_columns(monkeypatch, stats_api):
+    monkeypatch.setattr(config, 'NBA_STATS_API_URL', f'{stats_api}/leaguedashplayerbiostats')
+    df = web_scraping_players_info.get_bio_json(2021)
+
+    assert list(df.columns) == list(web_scraping_players_info.BIO_API_COLUMNS.values())
+    assert len(df) == 8
+    path, query, headers = StatsApiHandler.requests[0]
+    assert query['Season'] == ['2020-21'] and query['SeasonType'] == ['Regular Season']
+    assert headers['x-nba-stats-origin'] == 'stats'
+    adams = df[df['Player'] == 'Steven Adams'].iloc[0]
+    assert (adams['Team'], adams['Age'], adams['Height'], adams['Weight']) == ('NOP', 27, '6-11', 265)
+
+
+def test_bio_json_maps_onto_players_info_columns(monkeypatch, stats_api, website_table):
+    monkeypatch.setattr(config, 'NBA_BIO_SOURCE', 'json')
+    monkeypatch.setattr(config, 'NBA_STATS_API_URL', f'{stats_api}/leaguedashplayerbiostats')
+    df = web_scraping_players_info.get_nba_players_data(2021, SEASON_IDS).set_index('player_id', drop=False)
+
+    assert website_table == []
+    assert list(df.columns) == PLAYERS_INFO_COLUMNS
+    # accents and suffixes are matched, the player missing from the season ids is dropped
+    assert sorted(df.index) == sorted(SEASON_IDS['player_id'])
+    assert df.loc['adamsst01', 'team'] == 'NOP'
+    assert df.loc['adamsst01', 'height'] == pytest.approx(6 * config.FEET_TO_CM + 11 * config.INCHES_TO_CM)
+    assert df.loc['adamsst01', 'weight'] == pytest.approx(265 * config.POUNDS_TO_KG)
+    assert df.loc['jokicni01', 'draft_round'] == 2
+    assert pd.isna(df.loc['paytoga02', 'draft_year'])
+
+
+def test_selenium_fallback_when_the_request_fails(monkeypatch, stats_api, website_table):
+    monkeypatch.setattr(config, 'NBA_BIO_SOURCE', 'json')
+    monkeypatch.setattr(config, 'NBA_STATS_API_URL', f'{stats_api}/unavailable')
+    df = web_scraping_players_info.get_nba_players_data(2021, SEASON_IDS)
+
+    assert StatsApiHandler.requests[0][0] == '/stats/unavailable'
+    assert len(website_table) == 1
+    assert list(df.columns) == PLAYERS_INFO_COLUMNS
+    assert df['player_id'].tolist() == ['adamsst01']
+
+
+
+class ScriptedDriver:
+    """ Selenium driver stand-in whose scripted read of the bio table returns the given table """
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, url):
+        pass
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_async_script(self, script, *args):
+        return self.table
+
+
+class ImmediateWait:
+    """ WebDriverWait stand-in, the elements waited for are already visible """
+
+    def __init__(self, driver, timeout):
+        pass
+
+    def until(self, condition):
+        return None
+
+
+@pytest.fixture
+def scripted_read(monkeypatch):
+    """ Reads the bio table of a ScriptedDriver, the page by page reader returns 'pages' """
+    monkeypatch.setattr(web_scraping_players_info, 'WebDriverWait', ImmediateWait)
+    monkeypatch.setattr(web_scraping_players_info, 'read_bio_table_pages', lambda driver, url: 'pages')
+    row = ['Steven Adams', 'NOP', '27', '6-11', '265', 'Pittsburgh', 'New Zealand', '2013', '1', '12']
+    return lambda headers: web_scraping_players_info.read_bio_table(
+        ScriptedDriver({'headers': headers, 'rows': [row]}), 'url')
+
+
+def test_script_table_is_read_in_one_call(scripted_read):
+    df = scripted_read(list(web_scraping_players_info.BIO_API_COLUMNS.values()))
+
+    assert df['Player'].tolist() == ['Steven Adams']
+    assert df['Age'].tolist() == [27]
+
+
+def test_script_table_with_unexpected_headers_is_read_page_by_page(scripted_read):
+    assert scripted_read([col.upper() for col in web_scraping_players_info.BIO_API_COLUMNS.values()]) == 'pages'
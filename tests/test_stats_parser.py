@@ -0,0 +1,42 @@
+import os
+import pytest
+import http_cache
+import http_fetcher
+import web_scraping_players_stats
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# saved Basketball Reference pages: (year, stat_extension, file, number of full_table rows)
+FIXTURE_PAGES = [(2021, '_totals.html', 'NBA_2021_totals.html', 13),
+                 (1979, '_per_game.html', 'NBA_1979_per_game.html', 7)]
+
+
+@pytest.fixture
+def saved_pages(monkeypatch):
+    """ Serves the fixture pages instead of requesting Basketball Reference """
+    def fetch(url, headers=None, use_cache=True):
+        with open(os.path.join(FIXTURES_DIR, url.rsplit('/', 1)[-1]), encoding='utf-8') as file:
+            return http_cache.CachedResponse(url, 200, file.read())
+    monkeypatch.setattr(http_fetcher, 'fetch', fetch)
+
+
+@pytest.mark.parametrize('year, stat_extension, filename, full_rows', FIXTURE_PAGES)
+def test_lxml_rows_parse_like_bs4_rows(saved_pages, year, stat_extension, filename, full_rows):
+    lxml_table = web_scraping_players_stats.parse_html(web_scraping_players_stats.get_html(year, stat_extension,
+                                                                                           backend='lxml'))
+    bs4_table = web_scraping_players_stats.parse_html(web_scraping_players_stats.get_html(year, stat_extension,
+                                                                                          backend='bs4'))
+    assert len(lxml_table) == full_rows
+    assert lxml_table == bs4_table
+    assert all(type(value) is str for row in lxml_table for value in row.values())
+
+
+@pytest.mark.parametrize('year, stat_extension, filename, full_rows', FIXTURE_PAGES)
+def test_lxml_columnar_frame_matches_bs4(saved_pages, year, stat_extension, filename, full_rows):
+    lxml_frame = web_scraping_players_stats.parse_html_columnar(
+        web_scraping_players_stats.get_html(year, stat_extension, backend='lxml'))
+    bs4_frame = web_scraping_players_stats.parse_html_columnar(
+        web_scraping_players_stats.get_html(year, stat_extension, backend='bs4'))
+    assert len(lxml_frame) == full_rows
+    assert lxml_frame.equals(bs4_frame)
+    assert list(lxml_frame.dtypes.astype(str)) == list(bs4_frame.dtypes.astype(str))
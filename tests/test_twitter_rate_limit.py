@@ -0,0 +1,158 @@
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pandas as pd
+import pytest
+import config
+import twitter_info
+
+
+class TwitterApiHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in of the users lookup endpoint: answers the statuses of `script` first (then 200), allows `window`
+    requests per rate limit window of `window_seconds` and answers 429 beyond it
+    """
+    lock = threading.Lock()
+    script = []
+    window = 1000
+    window_seconds = 1.0
+    delay = 0.0
+    state = {}
+
+    @classmethod
+    def reset(cls, script=(), window=1000, window_seconds=1.0, delay=0.0):
+        cls.script = list(script)
+        cls.window = window
+        cls.window_seconds = window_seconds
+        cls.delay = delay
+        cls.state = {'requests': [], 'in_flight': 0, 'max_in_flight': 0, 'too_many': 0, 'remaining': window,
+                     'reset': math.ceil(time.time() + window_seconds)}
+
+    def do_GET(self):
+        cls = TwitterApiHandler
+        with cls.lock:
+            now = time.time()
+            if now >= cls.state['reset']:
+                cls.state['remaining'] = cls.window
+                cls.state['reset'] = math.ceil(now + cls.window_seconds)
+            cls.state['requests'].append(now)
+            cls.state['in_flight'] += 1
+            cls.state['max_in_flight'] = max(cls.state['max_in_flight'], cls.state['in_flight'])
+            status = cls.script.pop(0) if cls.script else 200
+            if cls.state['remaining'] <= 0:
+                status = 429
+                cls.state['too_many'] += 1
+            else:
+                cls.state['remaining'] -= 1
+            remaining, reset = cls.state['remaining'], cls.state['reset']
+        time.sleep(cls.delay)
+        users = parse_qs(urlparse(self.path).query)['usernames'][0].split(',')
+        body = {'data': [{'id': str(index), 'username': user, 'created_at': '2010-01-01T00:00:00.000Z',
+                          'description': '', 'public_metrics': {'followers_count': 1, 'following_count': 2,
+                                                                'tweet_count': 3, 'listed_count': 4}}
+                         for index, user in enumerate(users)]} if status == 200 else {'title': 'error'}
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('x-rate-limit-remaining', str(remaining))
+        self.send_header('x-rate-limit-reset', str(reset))
+        self.end_headers()
+        self.wfile.write(payload)
+        with cls.lock:
+            cls.state['in_flight'] -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def twitter_api(monkeypatch, tmp_path):
+    """ Starts the stand-in endpoint and points the twitter client to it, with a clean rate limit window """
+    TwitterApiHandler.reset()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), TwitterApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(config, 'TWITTER_API_URL', f'http://127.0.0.1:{server.server_port}/2/users/by')
+    monkeypatch.setattr(config, 'TWITTER_BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(twitter_info, 'bearer_oauth', lambda request: request)
+    monkeypatch.setattr(twitter_info, '_rate_limit', {'remaining': None, 'reset': 0.0})
+    monkeypatch.chdir(tmp_path)
+    yield TwitterApiHandler
+    server.shutdown()
+    server.server_close()
+
+
+def test_server_errors_are_retried(twitter_api):
+    twitter_api.reset(script=[503, 500])
+    response = twitter_info.return_player_json(['KingJames'])
+
+    assert response['data'][0]['username'] == 'KingJames'
+    assert len(twitter_api.state['requests']) == 3
+
+
+def test_retries_stop_after_max_retries(monkeypatch, twitter_api):
+    monkeypatch.setattr(config, 'TWITTER_MAX_RETRIES', 2)
+    twitter_api.reset(script=[503] * 10)
+    with pytest.raises(Exception, match='503'):
+        twitter_info.return_player_json(['KingJames'])
+    assert len(twitter_api.state['requests']) == 3
+
+
+def test_client_errors_are_not_retried(twitter_api):
+    twitter_api.reset(script=[400])
+    with pytest.raises(Exception, match='400'):
+        twitter_info.return_player_json(['KingJames'])
+    assert len(twitter_api.state['requests']) == 1
+
+
+def test_requests_wait_for_the_rate_limit_reset(twitter_api):
+    twitter_api.reset(window=3, window_seconds=1.0)
+    first_reset = twitter_api.state['reset']
+    for batch in range(5):
+        twitter_info.return_player_json([f'player{batch}'])
+
+    requests = twitter_api.state['requests']
+    assert twitter_api.state['too_many'] == 0
+    assert len(requests) == 5
+    # the 4th request is sent once the window announced by x-rate-limit-reset is over
+    assert requests[2] < first_reset <= requests[3]
+
+
+def test_too_many_requests_waits_for_the_announced_reset(twitter_api):
+    twitter_api.reset(script=[429], window_seconds=1.0)
+    reset = twitter_api.state['reset']
+    twitter_info.return_player_json(['KingJames'])
+
+    requests = twitter_api.state['requests']
+    assert len(requests) == 2
+    assert requests[1] >= reset
+
+
+def test_batches_run_concurrently_up_to_the_cap(monkeypatch, twitter_api):
+    accounts = [f'player{index}' for index in range(24)]
+    players = pd.DataFrame({'player_id': [f'id{index}' for index in range(24)], 'twitter_address': accounts})
+    monkeypatch.setattr(twitter_info, 'get_all_players_id_file', lambda: players)
+    monkeypatch.setattr(config, 'TWITTER_USERS_LIMIT_API', 2)
+    monkeypatch.setattr(config, 'TWITTER_MAX_CONCURRENCY', 3)
+    twitter_api.reset(script=[503], delay=0.05)
+    details, snapshots = twitter_info.collect_players_twitter_data(incremental=False)
+
+    assert sorted(details['player_id']) == sorted(players['player_id'])
+    assert len(snapshots) == 24
+    assert len(twitter_api.state['requests']) == 12 + 1
+    assert twitter_api.state['max_in_flight'] == 3
+
+
+def test_batches_of_previous_runs_are_pruned(monkeypatch, twitter_api, tmp_path):
+    monkeypatch.setattr(config, 'TWITTER_USERS_LIMIT_API', 2)
+    for accounts in (['a1', 'a2', 'a3', 'a4'], ['b1', 'b2', 'b3']):
+        players = pd.DataFrame({'player_id': accounts, 'twitter_address': accounts})
+        monkeypatch.setattr(twitter_info, 'get_all_players_id_file', lambda: players)
+        twitter_info.collect_players_twitter_data(incremental=False)
+
+    with open(tmp_path / config.RUN_MANIFEST_FILE, encoding='utf-8') as file:
+        units = sorted(json.load(file))
+    assert units == sorted(twitter_info.batch_unit(users)[0] for users in (['b1', 'b2'], ['b3']))
+    assert len(list((tmp_path / config.RUN_PARTS_DIR / 'twitter').iterdir())) == 2
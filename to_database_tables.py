@@ -1,12 +1,33 @@
-import pvt_data_config
 import csv
-import pymysql
 import os
+import re
+import time
 import pathlib
+from contextlib import contextmanager
+from operator import itemgetter
 import config
 import logging
-
-logging.basicConfig(filename='nba_web_scrapping.log', encoding='utf-8', level=logging.INFO, format=config.LOG_FORMAT)
+import log_config
+import run_manifest
+import db_pool
+import db_backend
+import schema
+
+# columns updated when a player is loaded again, every column except the primary key
+PLAYERS_UPDATE_COLUMNS = {'players': ['name'],
+                          'players_info': ['team_id', 'age', 'height', 'weight', 'college', 'country', 'draft_year',
+                                           'draft_round', 'draft_number']}
+# columns of the csv files that have a different name on the tables
+CSV_COLUMN_NAMES = {'players': {'player': 'name'},
+                    'players_info': {'team': 'team_id'},
+                    **{table_name: {'team_id': 'team_season'} for table_name in schema.STATS_TABLES_DDL}}
+# columns of the csv files that are not stored on the tables (index column of csv files saved with pandas)
+CSV_OMITED_COLUMNS = {table_name: ['', 'player', 'age'] for table_name in schema.STATS_TABLES_DDL}
+DEFAULT_OMITED_COLUMNS = ['']
+# csv values stored as NULL in numeric columns
+NULL_VALUES = {'', 'Undrafted', None}
+# info message of the server after a LOAD DATA statement
+LOAD_DATA_INFO = re.compile(r'Records: (\d+)\s+Deleted: (\d+)\s+Skipped: (\d+)')
 
 
 def execute_query(query, executemany=False, tup_list=None):
@@ -15,108 +36,335 @@ def execute_query(query, executemany=False, tup_list=None):
     :param executemany: if True execute statement of multiple queries
     :param tup_list: tuples to execute if executemany is True
     :return: query result for single query
+    the query runs in its own transaction on a pooled connection (see db_pool)
     """
-    connection = pymysql.connect(host=pvt_data_config.HOST,
-                                 user=pvt_data_config.USER,
-                                 password=pvt_data_config.PASSWORD,
-                                 database=config.DATABASE_NAME)
-    with connection:
+    with db_pool.transaction() as connection:
         with connection.cursor() as cursor:
             sql = query
             # execute one query
             if not executemany:
                 cursor.execute(sql)
-                result = cursor.fetchall()
-                connection.commit()
-                return result
+                return cursor.fetchall()
             # execute many queries
             else:
                 cursor.executemany(sql, tup_list)
-                connection.commit()
 
 
-def generate_row(row_data, varchar_cols=[], omited_cols=[]):
+def _to_float(value):
+    """ Converts a csv value of a decimal column """
+    return None if value in NULL_VALUES else float(value)
+
+
+def _to_int(value):
+    """ Converts a csv value of an int column, values written as floats (e.g. '3.0') are accepted """
+    if value in NULL_VALUES:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return int(float(value))
+
+
+def _to_text(value):
+    """ Converts a csv value of a varchar column, the value is kept as written """
+    return value
+
+
+def _to_temporal(value):
+    """ Converts a csv value of a date or datetime column """
+    return None if value in NULL_VALUES else value
+
+
+def _converter(sql_type):
+    """ Returns the function converting csv values to the python value bound to a column of type sql_type """
+    if sql_type.startswith('decimal'):
+        return _to_float
+    if sql_type in ('int', 'bigint'):
+        return _to_int
+    if sql_type.startswith('varchar'):
+        return _to_text
+    if sql_type in ('date', 'datetime'):
+        return _to_temporal
+    raise TypeError(f'No csv converter defined for sql type {sql_type}')
+
+
+def match_csv_columns(table_name, header, constants=None):
+    """
+    Matches the columns of a csv file to the columns of a table by name (see CSV_COLUMN_NAMES), both load modes
+    (INSERT and LOAD DATA) check the csv against the table DDL in schema this way
+    :param table_name: name of the target table
+    :param header: column names of the csv file
+    :param constants: dict {table column: value} for columns that are not in the csv, e.g. {'season': 2021}
+    :return: dict {table column: csv column} of the csv columns that are loaded
+    raises ValueError if the csv and the table schema drifted apart: a csv column unknown to the table,
+    a required column missing or a constant for a column that is not in the table
+    """
+    constants = constants or {}
+    column_names = [name for name, sql_type in schema.table_columns(schema.TABLES_DDL[table_name])]
+    renames = CSV_COLUMN_NAMES.get(table_name, {})
+    omited = CSV_OMITED_COLUMNS.get(table_name, DEFAULT_OMITED_COLUMNS)
+
+    sources = {}
+    for key in header:
+        name = renames.get(key, key)
+        if key in omited:
+            continue
+        if name not in column_names:
+            logging.critical(f'Column {key} of the csv is not a column of table {table_name}')
+            raise ValueError(f'Column {key} of the csv is not a column of table {table_name}')
+        sources[name] = key
+
+    unknown_constants = set(constants) - set(column_names)
+    if unknown_constants:
+        raise ValueError(f'Constant columns {sorted(unknown_constants)} are not columns of table {table_name}')
+    required = schema.required_columns(schema.TABLES_DDL[table_name])
+    missing = [name for name in column_names if name not in sources and name not in constants]
+    missing_required = [name for name in missing if name in required]
+    if missing_required:
+        logging.critical(f'Required columns {missing_required} of table {table_name} are missing from the csv')
+        raise ValueError(f'Required columns {missing_required} of table {table_name} are missing from the csv')
+    if missing:
+        logging.warning(f'Columns {missing} of table {table_name} are missing from the csv, they will be NULL')
+    return sources
+
+
+def compile_row_codec(table_name, header, constants=None):
     """
-    :param row_data: dictionary with the data from one row of the csv file
-    :param varchar_cols: cols of type varchar
-    :param omited_cols: cols that will not be saved
-    :return: a list with the data of one row in the csv file
+    Builds once the encoder of the rows of a csv file for a table, from the table DDL in schema
+    the encoded tuples follow the column order of the table whatever the order of the csv columns
+    :param table_name: name of the target table
+    :param header: column names of the csv file (keys of the row dicts)
+    :param constants: dict {table column: value} for columns that are not in the csv, e.g. {'season': 2021}
+    :return: function encode(row) returning the tuple ready to bind for a row dict
+    raises ValueError if the csv and the table schema drifted apart (see match_csv_columns)
     """
-    row_data_list = []
-    # creating a list for each row by its value type
-    for key in row_data:
-        if key in omited_cols:
-            pass
-        elif key in varchar_cols:
-            row_data_list.append(row_data[key])
-        elif row_data[key] == '' or row_data[key] == 'Undrafted':
-            row_data_list.append(None)
+    constants = constants or {}
+    columns = schema.table_columns(schema.TABLES_DDL[table_name])
+    sources = match_csv_columns(table_name, header, constants)
+
+    # every table column reads one csv value (any one for constants and missing columns) and converts it
+    any_key = next(iter(sources.values()))
+    keys = []
+    converters = []
+    for name, sql_type in columns:
+        if name in constants:
+            keys.append(any_key)
+            converters.append(lambda value, constant=constants[name]: constant)
+        elif name in sources:
+            keys.append(sources[name])
+            converters.append(_converter(sql_type))
         else:
-            row_data_list.append(float(row_data[key]))
-    return row_data_list
+            keys.append(any_key)
+            converters.append(lambda value: None)
+    fetch = itemgetter(*keys)
 
+    def encode(row):
+        return tuple([convert(value) for convert, value in zip(converters, fetch(row))])
+    return encode
 
-def get_db_rows(table_name, col_names):
+
+def encode_rows(rows, table_name, constants=None):
+    """
+    Encodes csv row dicts to tuples ready to bind for a table, the codec is compiled from the first row
+    :param rows: iterable of dicts with the csv columns
+    :param table_name: name of the target table
+    :param constants: dict {table column: value} for columns that are not in the csv
+    :return: list of tuples in the column order of the table
     """
-    returns a result of sql query
-    :param table_name: database table name
-    :param col_names: table specific columns
-    :return: tuple of the identifing columns of the table
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return []
+    encode = compile_row_codec(table_name, list(first), constants)
+    tup_list = [encode(first)]
+    tup_list.extend(map(encode, rows))
+    return tup_list
+
+
+@contextmanager
+def deferred_checks(connection):
     """
-    in_db = execute_query(f"""SELECT {', '.join(col_names)} FROM {table_name}""")
-    return in_db
+    Turns off the foreign key checks (config.DB_DEFER_FK_CHECKS) and unique checks (config.DB_DEFER_UNIQUE_CHECKS)
+    of a connection for the duration of a bulk load, they are turned on again afterwards
+    Unique checks should only be deferred when the loaded rows are known to be unique, duplicates may go undetected
+    The embedded backends have no such session settings, the checks stay on
+    """
+    settings = []
+    if db_backend.is_embedded():
+        yield connection
+        return
+    if config.DB_DEFER_FK_CHECKS:
+        settings.append('foreign_key_checks')
+    if config.DB_DEFER_UNIQUE_CHECKS:
+        settings.append('unique_checks')
+    if not settings:
+        yield connection
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('SET ' + ', '.join(f'{setting} = 0' for setting in settings))
+    try:
+        yield connection
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SET ' + ', '.join(f'{setting} = 1' for setting in settings))
 
 
-def insert_tuple_to_db(tup_list, table_name):
+def log_load_rate(table_name, rows, started):
+    """ Logs the number of rows loaded to a table and the load throughput in rows per second """
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else float('inf')
+    logging.info(f'{rows} rows loaded to {table_name} in {elapsed:.2f}s ({rate:.0f} rows/s)')
+
+
+def insert_tuple_to_db(tup_list, table_name, update_cols=None, ignore_duplicates=False):
     """
     takes a list of tuples to insert into database table
+    duplicates are resolved by the unique keys of the table on the server, no table scan is needed
+    rows are sent as multi-row INSERT statements of config.DB_INSERT_CHUNK_SIZE rows, each chunk in its own transaction
     :param tup_list: data to be inserted to table
     :param table_name: table that the data is inserted to
+    :param update_cols: if given, rows whose key already exists get these columns updated instead of failing
+    :param ignore_duplicates: if True, rows whose key already exists are skipped (INSERT IGNORE)
     """
     # check if there is new data to insert
     if len(tup_list) > 0:
-        col_num = '%s, ' * len(tup_list[0])
-        stmt = f"INSERT INTO {table_name} VALUES ({col_num[:-2]})"
-        execute_query(stmt, executemany=True, tup_list=tup_list)
-        logging.info(f'Data inserted to {table_name} table')
+        key_columns = schema.primary_key_columns(schema.TABLES_DDL[table_name])
+        stmt = db_backend.insert_statement(table_name, len(tup_list[0]), key_columns, update_cols, ignore_duplicates)
+        started = time.perf_counter()
+        chunk_size = config.DB_INSERT_CHUNK_SIZE
+        with db_pool.connection() as connection, deferred_checks(connection):
+            for start in range(0, len(tup_list), chunk_size):
+                connection.begin()
+                with connection.cursor() as cursor:
+                    # pymysql sends each chunk as multi-row INSERT statements
+                    cursor.executemany(stmt, tup_list[start:start + chunk_size])
+                connection.commit()
+        log_load_rate(table_name, len(tup_list), started)
     else:
         logging.info(f'No new data to insert to {table_name} table')
 
 
+def load_stats_rows(rows, year, type_of_stat):
+    """
+    inserts rows of a statistics table to the appropriate mysql table in nba_data db
+    rows already loaded (same player_id, season and team_season) get their statistics updated
+    :param rows: iterable of dicts with the scraped columns of one player each (same as the csv columns)
+    :param year: year the season finished
+    :param type_of_stat: type of stat(totals, per_game, per_minute, per_poss)
+    """
+    table_name = f'stats_{type_of_stat}'
+    # each dictionary (representing a player) is encoded to a tuple in the column order of the table
+    tup_list = encode_rows(rows, table_name, constants={'season': year})
+    update_cols = [name for name, sql_type in schema.table_columns(schema.STATS_TABLES_DDL[table_name])
+                   if name not in schema.STATS_KEY_COLUMNS]
+    insert_tuple_to_db(tup_list, table_name=table_name, update_cols=update_cols)
+
+
+def load_stats_file(filename, year, type_of_stat):
+    """
+    bulk loads a sample_*.csv file to the appropriate mysql table with LOAD DATA LOCAL INFILE
+    files written by the csv module (CRLF line ends) and by pandas in columnar mode (LF) are both accepted
+    the file is streamed by the server, columns are matched by name and rows with an existing key are replaced
+    :param filename: string representing the file name
+    :param year: year the season finished
+    :param type_of_stat: type of stat(totals, per_game, per_minute, per_poss)
+    """
+    table_name = f'stats_{type_of_stat}'
+    table_cols = dict(schema.table_columns(schema.STATS_TABLES_DDL[table_name]))
+    with open(filename, encoding='utf-8', newline='') as file:
+        first_line = file.readline()
+        header = next(csv.reader([first_line]))
+        rows = sum(1 for line in file)
+    # the csv module ends lines with \r\n, pandas (columnar mode) with os.linesep: the server is told which one
+    line_terminator = r'\r\n' if first_line.endswith('\r\n') else r'\n'
+
+    # the csv is checked against the table as in the INSERT mode, a drifted schema fails the load
+    loaded = set(match_csv_columns(table_name, header, constants={'season': year}).values())
+
+    # csv columns are read to user variables, empty numeric values are stored as NULL
+    targets = []
+    assignments = ['season = %s']
+    for index, col in enumerate(header):
+        name = CSV_COLUMN_NAMES[table_name].get(col, col)
+        if col not in loaded:
+            targets.append('@dummy')
+        elif table_cols[name].startswith('varchar'):
+            targets.append(name)
+        else:
+            targets.append(f'@v{index}')
+            assignments.append(f"{name} = NULLIF(@v{index}, '')")
+
+    stmt = f"""LOAD DATA LOCAL INFILE %s REPLACE INTO TABLE {table_name}
+               CHARACTER SET utf8mb4
+               FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+               LINES TERMINATED BY '{line_terminator}'
+               IGNORE 1 LINES
+               ({', '.join(targets)})
+               SET {', '.join(assignments)}"""
+    started = time.perf_counter()
+    with db_pool.transaction() as connection, deferred_checks(connection), connection.cursor() as cursor:
+        loaded = loaded_rows(cursor, cursor.execute(stmt, (os.path.abspath(filename), year)))
+        # a file the server could not split into rows must fail its load unit instead of being marked as loaded
+        if loaded == 0 and rows > 0:
+            logging.critical(f'No rows of {filename} were loaded to {table_name}, the file has {rows} lines')
+            raise ValueError(f'No rows of {filename} were loaded to {table_name}, the file has {rows} lines')
+    if loaded != rows:
+        logging.warning(f'{loaded} rows of {filename} were loaded to {table_name}, the file has {rows} lines')
+    log_load_rate(table_name, loaded, started)
+
+
+def loaded_rows(cursor, affected_rows):
+    """
+    Returns the number of csv rows loaded by the last LOAD DATA statement of a cursor, the records the server read
+    minus the ones it skipped (info message of the server)
+    The affected rows are only used when the server sent no info message, REPLACE counts a replaced row twice there
+    :param cursor: pymysql cursor that executed the statement
+    :param affected_rows: value returned by cursor.execute
+    """
+    message = getattr(getattr(cursor, '_result', None), 'message', None) or b''
+    if isinstance(message, bytes):
+        message = message.decode('utf-8', errors='replace')
+    match = LOAD_DATA_INFO.search(message)
+    if match is None:
+        return affected_rows
+    return int(match.group(1)) - int(match.group(3))
+
+
 def to_stats_table(filename):
     """
     takes csv file and insert it to the appropriate mysql table in nba_data db
+    the rows are sent as INSERT statements or streamed with LOAD DATA LOCAL INFILE according to config.DB_LOAD_MODE
+    (MySQL only, the embedded backends always use INSERT statements)
     :param filename: string representing the file name
     :return: None
     """
+    # extract year and stat type from file name
+    year = int(filename.split('_')[1])
+    type_of_stat = '_'.join(filename.split('_')[2:]).split('.')[0]
+    if config.DB_LOAD_MODE == 'infile' and not db_backend.is_embedded():
+        load_stats_file(filename, year, type_of_stat)
+        return
+
     with open(filename, encoding='utf-8') as file:
-        # extract year and stat type from file name
-        year = int(filename.split('_')[1])
-        type_of_stat = '_'.join(filename.split('_')[2:]).split('.')[0]
         logging.info(f'finshed reading {filename}')
 
         # read the csv
         reader = csv.DictReader(file)
-        # store each dictionary (representing a player) to tupel list
-        tup_list = []
-        # query to check if sample is in database
-        in_db = get_db_rows(table_name=f'stats_{type_of_stat}', col_names=['player_id', 'season'])
-        varchar_cols = ['player_id', 'pos', 'team_id']
-        omited_cols = ['', 'player', 'age']
-        for index, player_data in enumerate(reader):
-            # creating a list for each row by its value type
-            row_data = generate_row(player_data, varchar_cols=varchar_cols, omited_cols=omited_cols)
-            # insert year column
-            row_data.insert(3, year)
-            # checking if sample is in database, only new data is stored
-            if (row_data[0], row_data[3]) in in_db:
-                # the sample exists in the database
-                pass
-            else:
-                # saving the row data to tuple and storing in tup_list
-                tup_list.append(tuple(row_data))
+        load_stats_rows(reader, year, type_of_stat)
 
-        insert_tuple_to_db(tup_list, table_name=f'stats_{type_of_stat}')
+
+def load_players_rows(rows, table_name):
+    """
+    inserts rows of players data to the appropriate mysql table in nba_data db
+    players already in the table get their data updated
+    :param rows: iterable of dicts with the columns of players_id.csv or players_info.csv
+    :param table_name: 'players' or 'players_info'
+    """
+    # each dictionary (representing a player) is encoded to a tuple in the column order of the table
+    tup_list = encode_rows(rows, table_name)
+
+    insert_tuple_to_db(tup_list, table_name=table_name, update_cols=PLAYERS_UPDATE_COLUMNS[table_name])
 
 
 def to_players_table(filename):
@@ -134,24 +382,36 @@ def to_players_table(filename):
 
         # read the csv
         reader = csv.DictReader(file)
-        # store each dictionary (representing a player) to tuple list
-        tup_list = []
-        # query to check if sample is in database
-        in_db = get_db_rows(table_name=table_name, col_names=['player_id'])
-        varchar_cols = ['player_id', 'team', 'college', 'country', 'player']
-        omited_cols = ['']
-        for index, player_data in enumerate(reader):
-            # creating a list for each row by its value type
-            row_data = generate_row(player_data, varchar_cols=varchar_cols, omited_cols=omited_cols)
-
-            # checking if sample is in database, only new data is stored
-            if (row_data[0],) in in_db:
-                pass
-            else:
-                # saving the row data to tuple and storing in tup_list
-                tup_list.append(tuple(row_data))
+        load_players_rows(reader, table_name)
+
 
-        insert_tuple_to_db(tup_list, table_name=table_name)
+def load_twitter_rows(rows, table_name='twitter_details'):
+    """
+    inserts rows of players twitter details to the twitter_details mysql table in nba_data db
+    players already in the table get their details updated (refreshed twitter metrics)
+    :param rows: iterable of dicts with the columns of twitter_details.csv
+    :param table_name: name of the table
+    """
+    # each dictionary (representing a player) is encoded to a tuple in the column order of the table
+    tup_list = encode_rows(rows, table_name)
+
+    insert_tuple_to_db(tup_list, table_name=table_name,
+                       update_cols=['creation_date', 'user_name', 'twitter_id', 'followers_count', 'following_count',
+                                    'tweet_count', 'listed_count', 'description'])
+
+
+def load_twitter_snapshot_rows(rows, table_name='twitter_snapshots'):
+    """
+    inserts time-stamped twitter metrics of players to the twitter_snapshots mysql table in nba_data db
+    loading the same snapshot twice leaves a single row
+    :param rows: iterable of dicts with the columns of twitter_snapshots.csv
+    :param table_name: name of the table
+    """
+    # each dictionary (representing a player) is encoded to a tuple in the column order of the table
+    tup_list = encode_rows(rows, table_name)
+
+    insert_tuple_to_db(tup_list, table_name=table_name,
+                       update_cols=['followers_count', 'following_count', 'tweet_count', 'listed_count'])
 
 
 def to_twitter_table(filename):
@@ -166,24 +426,18 @@ def to_twitter_table(filename):
 
         # read the csv
         reader = csv.DictReader(file)
-        # store each dictionary (representing a player) to tuple list
-        tup_list = []
-        # query to check if sample is in database
-        in_db = get_db_rows(table_name=table_name, col_names=['player_id'])
-        varchar_cols = ['player_id', 'creation_date', 'user_name', 'description']
-        omited_cols = ['']
-        for index, player_data in enumerate(reader):
-            # creating a list for each row by its value type
-            row_data = generate_row(player_data, varchar_cols=varchar_cols, omited_cols=omited_cols)
-
-            # checking if sample is in database, only new data is stored
-            if (row_data[0],) in in_db:
-                pass
-            else:
-                # saving the row data to tuple and storing in tup_list
-                tup_list.append(tuple(row_data))
+        load_twitter_rows(reader, table_name)
 
-        insert_tuple_to_db(tup_list, table_name=table_name)
+
+def to_twitter_snapshots_table(filename):
+    """
+    takes the twitter snapshots csv file of a run and insert it to the twitter_snapshots mysql table in nba_data db
+    :param filename: string representing the file name
+    """
+    with open(filename, encoding='utf-8') as file:
+        logging.info(f'finshed reading {filename}')
+        reader = csv.DictReader(file)
+        load_twitter_snapshot_rows(reader)
 
 
 def to_teams_table():
@@ -227,31 +481,76 @@ def to_teams_table():
     logging.info(f'Data inserted to teams table')
 
 
+def load_target():
+    """
+    Returns the name of the database the files are loaded to: its url and the time its schema was created
+    Load units of the run manifest are keyed by it, so another backend, server or file, or the same database
+    dropped and created again, gets the files loaded again
+    """
+    created_at = execute_query('SELECT applied_at FROM schema_version WHERE version = 1')
+    return f'{db_pool.database_url()}@{created_at[0][0] if created_at else None}'
+
+
 def write_file_types(file_list, db_func, startswith, endswith='.csv'):
     """
     :param file_list: list of files to process
     :param db_func: function to save data to specific table
     :param startswith: characters in the start of file name
     :param endswith: characters in the end of file name
+    files already loaded to the same database by a previous run with the same content (see run_manifest and
+    load_target) are skipped
     """
+    target = None
     for file in file_list:
         # insert specific type of csv files to mysql tables
         if file.endswith(endswith) and file.startswith(startswith):
-            db_func(file)
+            target = target or load_target()
+            unit = f'load:{target}:{file}'
+            if run_manifest.is_done(unit, [file]):
+                continue
+            try:
+                db_func(file)
+            except Exception as exc:
+                run_manifest.mark_failed(unit, exc)
+                raise
+            run_manifest.mark_done(unit, [file])
             logging.info(f'Data for {file} inserted succesfully')
 
 
-def write_to_tables():
+def list_current_files():
+    """ Returns the list of all files in current directory """
     current_path = pathlib.Path().resolve()
-    # list of all files in current directory
-    onlyfiles = [f for f in os.listdir(current_path) if os.path.isfile(os.path.join(current_path, f))]
+    return [f for f in os.listdir(current_path) if os.path.isfile(os.path.join(current_path, f))]
+
+
+def write_players_tables():
+    """ inserts the players_id.csv and players_info.csv files to the players and players_info tables """
+    write_file_types(list_current_files(), db_func=to_players_table, startswith='players', endswith='.csv')
 
+
+def write_stats_tables():
+    """ inserts the sample_*.csv files to the stats tables, players must be loaded before (foreign keys) """
+    write_file_types(list_current_files(), db_func=to_stats_table, startswith='sample', endswith='.csv')
+
+
+def write_twitter_table():
+    """
+    inserts the twitter_details.csv and twitter snapshots files to the twitter_details and twitter_snapshots tables
+    only the snapshots of the last run (config.TWITTER_RUN_SNAPSHOTS_FILE) are loaded, the previous runs ones are
+    already in the table, the whole history stays in config.TWITTER_SNAPSHOTS_FILE
+    """
+    write_file_types(list_current_files(), db_func=to_twitter_table, startswith='twitter_details', endswith='.csv')
+    write_file_types(list_current_files(), db_func=to_twitter_snapshots_table,
+                     startswith=config.TWITTER_RUN_SNAPSHOTS_FILE, endswith='.csv')
+
+
+def write_to_tables():
     # insert csv files data to mysql database, for each table type
     to_teams_table()
-    write_file_types(onlyfiles, db_func=to_players_table, startswith='players', endswith='.csv')
-    write_file_types(onlyfiles, db_func=to_stats_table, startswith='sample', endswith='.csv')
-    write_file_types(onlyfiles, db_func=to_twitter_table, startswith='twitter_details', endswith='.csv')
-
+    write_players_tables()
+    write_stats_tables()
+    write_twitter_table()
 
 if __name__ == "__main__":
+    log_config.setup_logging()
     write_to_tables()
@@ -1,4 +1,8 @@
 import requests
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
 import csv
 import config
@@ -7,9 +11,30 @@ import json
 import pandas as pd
 import logging
 import config
-import pvt_data_config
-
-logging.basicConfig(filename='nba_twitter_api.log', encoding='utf-8', level=logging.INFO, format=config.LOG_FORMAT)
+import http_fetcher
+import log_config
+import run_manifest
+import atomic_file
+import hashlib
+from datetime import datetime, timezone
+
+# columns of the twitter details, in the order of the twitter_details table
+TWITTER_COLUMNS = ['player_id', 'creation_date', 'user_name', 'twitter_id', 'followers_count',
+                   'following_count', 'tweet_count', 'listed_count', 'description']
+# fields of the /2/users/by payload after flattening, renamed to the twitter details columns
+TWITTER_JSON_FIELDS = {'created_at': 'creation_date', 'username': 'user_name', 'id': 'twitter_id',
+                       'public_metrics.followers_count': 'followers_count',
+                       'public_metrics.following_count': 'following_count',
+                       'public_metrics.tweet_count': 'tweet_count',
+                       'public_metrics.listed_count': 'listed_count',
+                       'description': 'description'}
+TWITTER_COUNT_COLUMNS = ['followers_count', 'following_count', 'tweet_count', 'listed_count']
+# columns of the time-stamped metrics snapshots, in the order of the twitter_snapshots table
+SNAPSHOT_COLUMNS = ['player_id', 'snapshot_time'] + TWITTER_COUNT_COLUMNS
+
+# rate limit window of the users lookup endpoint, updated from the x-rate-limit-* headers of every response
+_rate_limit = {'remaining': None, 'reset': 0.0}
+_rate_limit_lock = threading.Lock()
 
 
 def create_url(users):
@@ -20,29 +45,89 @@ def create_url(users):
     users = ','.join(users)
     usernames = f"usernames={users}"
     user_fields = "user.fields=description,created_at,public_metrics"
-    url = "https://api.twitter.com/2/users/by?{}&{}".format(usernames, user_fields)
+    url = "{}?{}&{}".format(config.TWITTER_API_URL, usernames, user_fields)
     logging.info(f"URL for players {users} created successfully")
     return url
 
 
 def bearer_oauth(r):
     """ Returns the Bearer token authentication """
+    # the private credentials file is only needed once a request is sent
+    import pvt_data_config
     r.headers["Authorization"] = f"Bearer {pvt_data_config.TWITTER_BEARER_TOKEN}"
     r.headers["User-Agent"] = "v2UserLookupPython"
     logging.info("Bearer token authentication created successfully")
     return r
 
 
+def _update_rate_limit(response):
+    """ Stores the rate limit window announced by the x-rate-limit-remaining/reset headers of a response """
+    remaining = response.headers.get('x-rate-limit-remaining')
+    reset = response.headers.get('x-rate-limit-reset')
+    if remaining is None or reset is None:
+        return
+    with _rate_limit_lock:
+        _rate_limit['remaining'] = int(remaining)
+        _rate_limit['reset'] = float(reset)
+
+
+def _wait_for_rate_limit():
+    """
+    Blocks while the rate limit window is exhausted, then takes one request of the window
+    The window is reserved locally so concurrent batches do not overshoot the quota before the next response arrives
+    """
+    while True:
+        with _rate_limit_lock:
+            remaining = _rate_limit['remaining']
+            wait = _rate_limit['reset'] - time.time()
+            if remaining is None or remaining > 0 or wait <= 0:
+                if remaining is not None:
+                    _rate_limit['remaining'] = remaining - 1 if wait > 0 else None
+                return
+        logging.warning(f'Twitter rate limit reached, waiting {wait:.0f}s for the window to reset')
+        time.sleep(wait + random.uniform(0, 1))
+
+
+def _backoff_delay(attempt, response):
+    """ Returns the seconds to wait before retrying a failed request, with full jitter """
+    if response is not None and response.status_code == 429 and response.headers.get('x-rate-limit-reset'):
+        wait = float(response.headers['x-rate-limit-reset']) - time.time()
+        if wait > 0:
+            return wait + random.uniform(0, 1)
+    return random.uniform(0, min(config.TWITTER_BACKOFF_MAX, config.TWITTER_BACKOFF_BASE * 2 ** attempt))
+
+
 def connect_to_endpoint(url):
-    """ Connects to API endpoint """
-    response = requests.request("GET", url, auth=bearer_oauth, )
-    logging.debug(f"Response status code is {response.status_code} for url {url}")
-    if response.status_code != 200:
-        logging.critical(f"Request failed for url {url}")
-        raise Exception(f"Request returned an error: {response.status_code} {response.text}")
-    else:
-        logging.info(f"Request succeeded for url {url}")
-        return response.json()
+    """
+    Connects to API endpoint through the shared pooled session
+    Respects the rate limit window and retries 429 and 5xx responses (and connection errors) with jittered backoff
+    :param url: url of the request
+    :return: json of the response
+    """
+    session = http_fetcher.get_session()
+    for attempt in range(config.TWITTER_MAX_RETRIES + 1):
+        _wait_for_rate_limit()
+        response = None
+        try:
+            response = session.get(url, auth=bearer_oauth, timeout=config.FETCH_TIMEOUT)
+        except requests.exceptions.RequestException as exc:
+            logging.warning(f'Request failed for url {url} on attempt {attempt + 1}, exception {exc}')
+        else:
+            logging.debug(f"Response status code is {response.status_code} for url {url}")
+            _update_rate_limit(response)
+            if response.status_code == 200:
+                logging.info(f"Request succeeded for url {url}")
+                return response.json()
+            if response.status_code != 429 and response.status_code < 500:
+                break
+            logging.warning(f'Request returned {response.status_code} for url {url} on attempt {attempt + 1}')
+        if attempt < config.TWITTER_MAX_RETRIES:
+            time.sleep(_backoff_delay(attempt, response))
+
+    logging.critical(f"Request failed for url {url}")
+    if response is None:
+        raise Exception(f"Request could not connect to {url}")
+    raise Exception(f"Request returned an error: {response.status_code} {response.text}")
 
 
 def return_player_json(users):
@@ -53,29 +138,65 @@ def return_player_json(users):
     return json_response
 
 
+def empty_twitter_df():
+    """ Returns an empty DataFrame with the twitter details columns """
+    return pd.DataFrame(columns=TWITTER_COLUMNS)
+
+
+def decode_users(player_json, players_dict):
+    """
+    Converts a /2/users/by json payload into a DataFrame in one vectorized step
+    :param player_json: json response of the twitter API, the users are in its 'data' list
+    :param players_dict: dict {lowercase twitter user name: player_id}
+    :return: DataFrame with TWITTER_COLUMNS, one row per user of a known player (users that are not accounts of
+    players_dict, e.g. renamed accounts, are logged and dropped)
+    """
+    users = player_json.get('data', [])
+    if not users:
+        return empty_twitter_df()
+
+    # public_metrics is flattened to public_metrics.<field> columns
+    df = pd.json_normalize(users).reindex(columns=list(TWITTER_JSON_FIELDS)).rename(columns=TWITTER_JSON_FIELDS)
+    df['creation_date'] = df['creation_date'].str[:10]
+    df['twitter_id'] = df['twitter_id'].astype(str)
+    df[TWITTER_COUNT_COLUMNS] = df[TWITTER_COUNT_COLUMNS].apply(pd.to_numeric, errors='coerce').astype('Int64')
+    # json might come out of order, we use the dictionary to get the player id for the equivalent twitter account
+    df['player_id'] = df['user_name'].str.lower().map(players_dict)
+    unmatched = df['player_id'].isna()
+    if unmatched.any():
+        logging.warning(f'{unmatched.sum()} twitter users are not accounts of known players, they are dropped: '
+                        f'{df.loc[unmatched, "user_name"].tolist()}')
+        df = df[~unmatched]
+    return df[TWITTER_COLUMNS]
+
+
 def return_player_df(users, players_dict):
     """ Converts the json response into a pandas dataframe object """
-    player_json = return_player_json(users)
-
-    players_df = pd.DataFrame(columns=['player_id', 'creation_date', 'user_name', 'twitter_id', 'followers_count',
-                                       'following_count', 'tweet_count', 'listed_count', 'description'])
-    for index, dict_ in enumerate(player_json['data']):
-        # extracts data from the json file
-        creation_date = dict_['created_at'][:10]
-        user_name = dict_['username']
-        twitter_id = dict_['id']
-        followers_count = dict_['public_metrics']['followers_count']
-        following_count = dict_['public_metrics']['following_count']
-        tweet_count = dict_['public_metrics']['tweet_count']
-        listed_count = dict_['public_metrics']['listed_count']
-        description = dict_['description']
-
-        # json might come out of order, we use the dictionary to get the player id for the equivalent twitter account
-
-        player_id = players_dict[user_name.lower()]
-
-        players_df.loc[index] = [player_id, creation_date, user_name, twitter_id, followers_count,
-                                 following_count, tweet_count, listed_count, description]
+    return decode_users(return_player_json(users), players_dict)
+
+
+def batch_unit(users):
+    """ Returns the run manifest unit of a batch of users and the path of its result file """
+    batch_hash = hashlib.sha256(','.join(sorted(users)).encode('utf-8')).hexdigest()[:16]
+    return f'twitter:{batch_hash}', run_manifest.part_path('twitter', f'batch_{batch_hash}.csv')
+
+
+def get_batch_player_df(users, players_dict):
+    """
+    Returns the dataframe with the details of a batch of users, reusing the result of a previous run when it is
+    recent enough (config.RUN_TWITTER_MAX_AGE) and unchanged (see run_manifest)
+    """
+    unit, path = batch_unit(users)
+    if run_manifest.is_done(unit, [path], max_age=config.RUN_TWITTER_MAX_AGE):
+        return pd.read_csv(path, dtype={'twitter_id': str})
+
+    try:
+        players_df = return_player_df(users, players_dict)
+    except Exception as exc:
+        run_manifest.mark_failed(unit, exc)
+        raise
+    players_df.to_csv(path, index=None)
+    run_manifest.mark_done(unit, [path])
     return players_df
 
 
@@ -93,7 +214,7 @@ def get_twitter_accounts():
     """ Creates a csv file with players_id and players twitter account name """
     # get request of twitter info from Basketball-Reference.com
     url = config.TWITTER_ADDRESSED_LIST
-    response = requests.get(url)
+    response = http_fetcher.fetch(url)
     if response.status_code != 200:
         logging.critical(f'request status {response} for players twitter info - NOT SUCCESSFUL!')
     else:
@@ -137,7 +258,7 @@ def get_twitter_accounts():
         for row in player_twitter:
             try:
                 csv_writer.writerow([cell for cell in row])
-                logging.info(f"data for player {row[0]} saved successfully")
+                logging.debug(f"data for player {row[0]} saved successfully")
             except Exception as exc:
                 logging.error(f"Could not save data of player {row[0]}, Details of exception: {exc}")
 
@@ -171,17 +292,63 @@ def df_to_dict(df, reverse_order=False, lowercase_all=True):
         col1 = df.columns[1]
         col2 = df.columns[0]
 
-    dict_ = {}
-    for index, row in df.iterrows():
-        if lowercase_all:
-            dict_[row[col1].lower()] = row[col2.lower()]
-        else:
-            dict_[row[col1]] = row[col2]
+    keys = df[col1].astype(str)
+    if lowercase_all:
+        keys = keys.str.lower()
+    dict_ = dict(zip(keys, df[col2]))
     return dict_
 
 
-def export_players_twitter_data():
-
+def load_fetch_state():
+    """ Returns the fetch state {lowercase twitter account: unix time of its last successful fetch} """
+    if not os.path.exists(config.TWITTER_FETCH_STATE_FILE):
+        return {}
+    with open(config.TWITTER_FETCH_STATE_FILE, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_fetch_state(state):
+    """ Saves the fetch state, the previous file is replaced atomically """
+    atomic_file.write_json(config.TWITTER_FETCH_STATE_FILE, state, sort_keys=True)
+
+
+def accounts_to_refresh(twitter_ids, state, max_age=config.TWITTER_REFRESH_MAX_AGE, now=None):
+    """
+    Returns the accounts that were never fetched or whose last fetch is older than max_age
+    :param twitter_ids: list of twitter accounts
+    :param state: fetch state, see load_fetch_state
+    :param max_age: seconds after which an account is fetched again
+    :param now: unix time of the run, defaults to the current time
+    """
+    now = time.time() if now is None else now
+    return [account for account in twitter_ids if now - state.get(account.lower(), 0) >= max_age]
+
+
+def read_previous_details():
+    """ Returns the twitter details of the previous run (twitter_details.csv), None if there is no previous run """
+    if not os.path.exists('twitter_details.csv'):
+        return None
+    previous = pd.read_csv('twitter_details.csv', dtype={'twitter_id': str})
+    # files written before unmatched users were dropped may hold rows without player
+    return previous[previous['player_id'].notna()]
+
+
+def merge_twitter_details(previous, updates):
+    """ Returns the previous twitter details with the rows of the refreshed players replaced by their updates """
+    if previous is None or previous.empty:
+        return updates
+    previous = previous[~previous['player_id'].isin(updates['player_id'])]
+    return pd.concat([previous, updates], ignore_index=True)[TWITTER_COLUMNS]
+
+
+def collect_players_twitter_data(incremental=config.TWITTER_INCREMENTAL):
+    """
+    Returns the twitter details of all players with a known account and the metrics snapshots of this run
+    In incremental mode only new accounts and accounts older than config.TWITTER_REFRESH_MAX_AGE are requested,
+    the other players keep the details of the previous run
+    :param incremental: if False every account is requested
+    :return: tuple (DataFrame with TWITTER_COLUMNS, DataFrame with SNAPSHOT_COLUMNS of the refreshed players)
+    """
     try:
         players = get_all_players_id_file()
         twitter_ids = players['twitter_address'].tolist()
@@ -189,39 +356,72 @@ def export_players_twitter_data():
     except Exception as exc:
         logging.critical(f'Could not retrieve players twitter accounts, exception {exc}')
 
-    limit = config.TWITTER_USERS_LIMIT_API
-    start = 0
-    end = limit
-
-    df_info = pd.DataFrame(columns=['player_id', 'creation_date', 'user_name', 'twitter_id', 'followers_count',
-                                    'following_count', 'tweet_count', 'listed_count', 'description'])
+    state = load_fetch_state()
+    run_time = time.time()
+    previous = read_previous_details() if incremental else None
+    if previous is not None:
+        twitter_ids = accounts_to_refresh(twitter_ids, state, now=run_time)
+    logging.info(f'{len(twitter_ids)} twitter accounts to request')
 
-    while True:
-        # players that we'll do the request for
-        users = twitter_ids[start:end]
-        if len(users) == 0:
-            break
-
-        try:
-            players_df = return_player_df(users, players_dict)
-            df_info = pd.concat([df_info, players_df])
-        except Exception as exc:
-            logging.critical(f'Could not generate dataframe with the info for players {users}, exception {exc}')
-            break
+    # players that we'll do the requests for, in batches of the api limit
+    limit = config.TWITTER_USERS_LIMIT_API
+    user_batches = [twitter_ids[start:start + limit] for start in range(0, len(twitter_ids), limit)]
+
+    # batches are requested concurrently, a failed batch does not stop the others
+    results = {}
+    with ThreadPoolExecutor(max_workers=config.TWITTER_MAX_CONCURRENCY, thread_name_prefix='twitter') as executor:
+        futures = {executor.submit(get_batch_player_df, users, players_dict): index
+                   for index, users in enumerate(user_batches)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as exc:
+                logging.critical(f'Could not generate dataframe with the info for players {user_batches[index]}, '
+                                 f'exception {exc}')
+                continue
+            # accounts missing from the response (suspended, renamed) are not requested again before max age either
+            state.update({account.lower(): run_time for account in user_batches[index]})
+    save_fetch_state(state)
+    # batches are keyed by their accounts, which change every incremental run: only this run's ones are kept
+    run_manifest.prune('twitter:', keep=[batch_unit(users)[0] for users in user_batches])
+
+    # batches are collected and concatenated once at the end, in request order
+    batches = [results[index] for index in sorted(results)]
+    updates = pd.concat(batches, ignore_index=True).drop_duplicates() if batches else empty_twitter_df()
+
+    snapshots = updates[['player_id'] + TWITTER_COUNT_COLUMNS].copy()
+    snapshots.insert(1, 'snapshot_time', datetime.fromtimestamp(run_time, timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+    return merge_twitter_details(previous, updates), snapshots
+
+
+def append_snapshots(df_snapshots):
+    """
+    Appends the metrics snapshots of a run to the snapshots file (config.TWITTER_SNAPSHOTS_FILE), the history of all
+    runs, and saves them alone to config.TWITTER_RUN_SNAPSHOTS_FILE, the file loaded to the database
+    """
+    write_header = not os.path.exists(config.TWITTER_SNAPSHOTS_FILE)
+    df_snapshots.to_csv(config.TWITTER_SNAPSHOTS_FILE, mode='a', header=write_header, index=None)
+    df_snapshots.to_csv(config.TWITTER_RUN_SNAPSHOTS_FILE, index=None)
 
-        start += limit
-        end += limit
 
+def export_players_twitter_data():
+    """
+    Saves the twitter details of all players with a known account to twitter_details.csv
+    and appends the metrics of the refreshed players to the snapshots files (see append_snapshots)
+    """
+    df_info, df_snapshots = collect_players_twitter_data()
     try:
-        df_info = df_info.drop_duplicates()
         df_info.to_csv('twitter_details.csv', index=None)
-        logging.info('File with twitter data for players exported successfully')
+        append_snapshots(df_snapshots)
+        logging.info(f'File with twitter data for players exported successfully, {len(df_snapshots)} players refreshed')
     except Exception as exc:
         logging.critical(f'Could not export file with players twitter details, exception {exc}')
         raise Exception(exc)
 
 
 if __name__ == "__main__":
+    log_config.setup_logging('nba_twitter_api.log')
     try:
         export_players_twitter_data()
     except Exception as exc:
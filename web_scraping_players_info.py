@@ -1,44 +1,42 @@
+import json
 import logging
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 import config
-from web_scraping_players_stats import get_html, parse_html
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+import log_config
+import run_manifest
+import http_cache
+from web_scraping_players_stats import get_parsed_table
+import webdriver_pool
+import http_fetcher
+import player_index
 
 pd.set_option('display.max_columns', 500)
-logging.basicConfig(filename='nba_web_scrapping.log', encoding='utf-8', level=logging.INFO, format=config.LOG_FORMAT)
 
 
-def convert_feet_inches_to_cm(feet_inches):
-    """ Converts str(feet-inches) to cm"""
-    try:
-        feet, inches = feet_inches.split('-')
-        return int(feet) * config.FEET_TO_CM + int(inches) * config.INCHES_TO_CM
-    except ValueError:
-        logging.error(f'ValueError occurred when trying to convert {feet_inches} to cm')
-        return ''
-    except TypeError:
-        logging.error(f'TypeError occurred when trying to convert {feet_inches} to cm')
-        return ''
-
-
-def convert_pounds_to_kg(pounds):
-    """ Converts pounds to cm"""
-    try:
-        return pounds * config.POUNDS_TO_KG
-    except ValueError:
-        logging.error(f'ValueError occurred when trying to convert {pounds} to kg')
-        return ''
-    except TypeError:
-        logging.error(f'TypeError occurred when trying to convert {pounds} to kg')
-        return ''
+def normalize_bio_frame(df):
+    """
+    Converts the players details to the units and types of the database with vectorized column operations:
+    height 'feet-inches' to cm, weight pounds to kg, age and draft columns to nullable ints ('Undrafted' is null)
+    :param df: DataFrame with the players details (renamed columns of get_nba_players_data)
+    :return: the same DataFrame, converted
+    """
+    feet_inches = df['height'].astype(str).str.split('-', n=1, expand=True).reindex(columns=[0, 1])
+    df['height'] = (pd.to_numeric(feet_inches[0], errors='coerce') * config.FEET_TO_CM +
+                    pd.to_numeric(feet_inches[1], errors='coerce') * config.INCHES_TO_CM)
+    df['weight'] = pd.to_numeric(df['weight'], errors='coerce') * config.POUNDS_TO_KG
+    df['age'] = pd.to_numeric(df['age'], errors='coerce').round().astype('Int64')
+    for col in ['draft_year', 'draft_round', 'draft_number']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int64')
+
+    invalid = df['height'].isna().sum() + df['weight'].isna().sum()
+    if invalid:
+        logging.error(f'{invalid} heights/weights could not be converted to cm/kg')
+    return df
 
 
 def get_nba_players_ids(season):
@@ -48,40 +46,112 @@ def get_nba_players_ids(season):
     :return: DataFrame with 2 columns: player_id and player (name of the player)
     """
     logging.debug(f'Extracting players ids from Basketball Reference Website')
-    html_ids = get_html(season, config.URL_END_TOTALS)
-    parsed_ids = parse_html(html_ids)
+    parsed_ids = get_parsed_table(season, config.URL_END_TOTALS)
     df_ids = pd.DataFrame(parsed_ids)
     df_ids = df_ids[['player_id', 'player']]
     logging.info(f'Successfully extracted players ids from Basketball Reference Website')
     return df_ids
 
 
-def get_nba_players_data(season, df_ids):
+BIO_DROPDOWN_XPATH = '/html/body/main/div/div/div[2]/div/div/nba-stat-table/div[1]/div/div/select'
+BIO_TABLE_XPATH = '/html/body/main/div/div/div[2]/div/div/nba-stat-table/div[2]/div[1]/table'
+
+# selects the "All" page size of the bio table, waits until the table re-rendered (its number of rows changed from
+# the first page) and the number of rows is stable, and returns the whole table as {headers: [...], rows: [[...], ...]}
+# in a single call, null if the table did not re-render in time so the caller reads it page by page
+READ_ALL_ROWS_SCRIPT = """
+const [dropdownXpath, tableXpath, timeoutMs, done] = arguments;
+const byXpath = xpath => document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null)
+    .singleNodeValue;
+const rowCount = table => table && table.tBodies.length ? table.tBodies[0].rows.length : 0;
+const select = byXpath(dropdownXpath);
+const all = select && Array.from(select.options).find(o => o.text.trim() === 'All' || o.value === '-1');
+if (!all) { done(null); return; }
+// with a single page the first page already holds every row, the table does not change
+const singlePage = select.options.length <= 2;
+const firstPageCount = rowCount(byXpath(tableXpath));
+select.value = all.value;
+select.dispatchEvent(new Event('change'));
+const deadline = Date.now() + timeoutMs;
+let last = -1, stable = 0;
+(function poll() {
+    const table = byXpath(tableXpath);
+    const count = rowCount(table);
+    stable = count === last ? stable + 1 : 0;
+    last = count;
+    if (count > 0 && (singlePage || count !== firstPageCount) && stable >= 3) {
+        // raw text as pd.read_html reads it, innerText would apply the CSS (e.g. text-transform) of the page
+        const cells = row => Array.from(row.cells).map(cell => cell.textContent.trim());
+        done({headers: cells(table.tHead.rows[0]), rows: Array.from(table.tBodies[0].rows).map(cells)});
+    } else if (Date.now() > deadline) {
+        done(null);
+    } else {
+        setTimeout(poll, 100);
+    }
+})();
+"""
+
+
+def _infer_numeric_columns(df):
+    """ Converts the columns where every non empty value is a number, as pd.read_html does """
+    for col in df.columns:
+        numbers = pd.to_numeric(df[col], errors='coerce')
+        if numbers.notna().sum() == (df[col] != '').sum():
+            df[col] = numbers
+    return df
+
+
+def read_bio_table_script(driver, url):
     """
-    Extracts all players details according to the season
-    :param season: year of the season to get the players information
-    :param df_ids: DataFrame with 2 columns: player_id and player (name of the player)
-    :return:
+    Reads the whole players bio table of the NBA website in one scripted call, switching it to the "All" page size
+    :param driver: selenium driver
+    :param url: url of the players bio page of a season
+    :return: DataFrame with all the rows, None if the page has no "All" page size, the table did not show all
+    the rows before the timeout or its headers are not the expected ones (BIO_API_COLUMNS)
     """
-    season_abrev = str(season)[2:]
-    season_start = season - 1
-    logging.debug(f'Opening NBA website to extract players information for season {season_start}/{season_abrev}')
-    url = f'https://www.nba.com/stats/players/bio/?Season={season_start}-{season_abrev}&SeasonType=Regular%20Season'
-    logging.debug(f'NBA url address: {url}')
+    driver.get(url)
+    logging.info(f'Opened url {url} successfully')
+    WebDriverWait(driver, config.WAITING_TIME_SELENIUM).until(
+        EC.visibility_of_element_located((By.XPATH, BIO_TABLE_XPATH)))
+    driver.set_script_timeout(config.WAITING_TIME_SELENIUM * 2)
+    table = driver.execute_async_script(READ_ALL_ROWS_SCRIPT, BIO_DROPDOWN_XPATH, BIO_TABLE_XPATH,
+                                        config.WAITING_TIME_SELENIUM * 1000)
+    if not table or not table['rows']:
+        logging.warning(f'Could not read all the rows of the bio table in one call on url {url}')
+        return None
+    missing = [col for col in BIO_API_COLUMNS.values() if col not in table['headers']]
+    if missing:
+        logging.warning(f'Bio table read in one call on url {url} is missing columns {missing}')
+        return None
+    logging.info(f'Table with {len(table["rows"])} players details read in one call')
+    return _infer_numeric_columns(pd.DataFrame(table['rows'], columns=table['headers']))
 
-    # have to download chrome driver according to your chrome version (https://chromedriver.chromium.org/downloads)
-    try:
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/83.0.4103.116 Safari/537.36'
-        chrome_options.add_argument(f'user-agent={user_agent}')
-        driver = webdriver.Chrome(ChromeDriverManager().install(), options=chrome_options)
 
-    except Exception as exc:
-        print('ERROR: Could not initialize chrome driver')
-        logging.critical(f'Could not initialize chrome driver, program will be terminated')
-        raise Exception(exc)
+def read_bio_table(driver, url):
+    """
+    Reads the players bio table of the NBA website, in one scripted call when config.NBA_BIO_EXTRACTION is
+    'script', else (or if the scripted call fails) page by page
+    :param driver: selenium driver
+    :param url: url of the players bio page of a season
+    :return: DataFrame with the rows of all the pages
+    """
+    if config.NBA_BIO_EXTRACTION == 'script':
+        try:
+            df = read_bio_table_script(driver, url)
+            if df is not None:
+                return df
+        except Exception as exc:
+            logging.error(f'Could not read bio table in one call, reading page by page, exception {exc}')
+    return read_bio_table_pages(driver, url)
+
 
+def read_bio_table_pages(driver, url):
+    """
+    Reads all the pages of the players bio table of the NBA website
+    :param driver: selenium driver
+    :param url: url of the players bio page of a season
+    :return: DataFrame with the rows of all the pages
+    """
     try:
         driver.get(url)
         logging.info(f'Opened url {url} successfully')
@@ -90,7 +160,7 @@ def get_nba_players_data(season, df_ids):
         logging.critical(f'Could not open requested url: {url}, program will be terminated')
         raise Exception(exc)
 
-    xpath_dropdown_pages = '/html/body/main/div/div/div[2]/div/div/nba-stat-table/div[1]/div/div/select'
+    xpath_dropdown_pages = BIO_DROPDOWN_XPATH
     try:
         dropdown_pages = WebDriverWait(driver, config.WAITING_TIME_SELENIUM).until(
             EC.visibility_of_element_located((By.XPATH,
@@ -103,9 +173,9 @@ def get_nba_players_data(season, df_ids):
         raise Exception(exc)
 
     page_num = 1
-    create_df = True
+    pages = []
     while True:
-        table_xpath = '/html/body/main/div/div/div[2]/div/div/nba-stat-table/div[2]/div[1]/table'
+        table_xpath = BIO_TABLE_XPATH
         try:
             table = WebDriverWait(driver, config.WAITING_TIME_SELENIUM).until(
                 EC.visibility_of_element_located((By.XPATH, table_xpath)))
@@ -118,11 +188,7 @@ def get_nba_players_data(season, df_ids):
                              f'program will be terminated')
             raise Exception(exc)
 
-        if create_df:
-            df = tmp_df
-            create_df = False
-        else:
-            df = pd.concat([df, tmp_df])
+        pages.append(tmp_df)
 
         if page_num > num_pages:
             break
@@ -140,42 +206,146 @@ def get_nba_players_data(season, df_ids):
                                  f'program will be terminated')
                 raise Exception(exc)
 
-    driver.close()
-    df = df.reset_index()
-    df = df.drop(columns=['index'])
+    df = pd.concat(pages, ignore_index=True)
+    return df
+
+
+# columns of the stats API bio dataset and their name on the bio table of the NBA website
+BIO_API_COLUMNS = {'PLAYER_NAME': 'Player', 'TEAM_ABBREVIATION': 'Team', 'AGE': 'Age', 'PLAYER_HEIGHT': 'Height',
+                   'PLAYER_WEIGHT': 'Weight', 'COLLEGE': 'College', 'COUNTRY': 'Country', 'DRAFT_YEAR': 'Draft Year',
+                   'DRAFT_ROUND': 'Draft Round', 'DRAFT_NUMBER': 'Draft Number'}
+
+
+def get_bio_json(season):
+    """
+    Gets the players bio dataset of a season in one request to the JSON endpoint behind the NBA website bio page
+    :param season: year of the season to get the players information
+    :return: DataFrame with the same columns as the bio table of the NBA website
+    """
+    params = {'LeagueID': '00', 'PerMode': 'PerGame', 'Season': f'{season - 1}-{str(season)[2:]}',
+              'SeasonType': 'Regular Season'}
+    url = f'{config.NBA_STATS_API_URL}?{urlencode(params)}'
+    response = http_fetcher.fetch(url, headers=config.NBA_STATS_API_HEADERS)
+    if response.status_code != 200:
+        logging.error(f'request status {response.status_code} for bio dataset of season {season} - NOT SUCCESSFUL!')
+        raise Exception(f'Request returned an error: {response.status_code} for url {url}')
+
+    result_set = json.loads(response.text)['resultSets'][0]
+    df = pd.DataFrame(result_set['rowSet'], columns=result_set['headers'])
+    missing = [col for col in BIO_API_COLUMNS if col not in df.columns]
+    if missing:
+        logging.error(f'Bio dataset of season {season} is missing columns {missing}')
+        raise TypeError(f'Bio dataset of season {season} is missing columns {missing}')
 
-    # joins with players ids
-    # inner joins get only rows with values on both tables
-    df = pd.merge(df, df_ids, how='inner', left_on='Player', right_on='player')
+    df = df[list(BIO_API_COLUMNS)].rename(columns=BIO_API_COLUMNS)
+    # the API returns numbers as text, the website table is read as numbers
+    df['Age'] = pd.to_numeric(df['Age'], errors='coerce')
+    df['Weight'] = pd.to_numeric(df['Weight'], errors='coerce')
+    logging.info(f'Bio dataset of season {season} read successfully, {len(df)} players')
+    return df
+
+
+def get_nba_players_data(season, df_ids):
+    """
+    Extracts all players details according to the season
+    :param season: year of the season to get the players information
+    :param df_ids: DataFrame with 2 columns: player_id and player (name of the player)
+    :return:
+    """
+    season_abrev = str(season)[2:]
+    season_start = season - 1
+    logging.debug(f'Opening NBA website to extract players information for season {season_start}/{season_abrev}')
+    url = f'https://www.nba.com/stats/players/bio/?Season={season_start}-{season_abrev}&SeasonType=Regular%20Season'
+    logging.debug(f'NBA url address: {url}')
+
+    df = None
+    if config.NBA_BIO_SOURCE == 'json':
+        try:
+            df = get_bio_json(season)
+        except Exception as exc:
+            logging.error(f'Could not get bio dataset of season {season} from the API, using selenium, '
+                          f'exception {exc}')
+    if df is None:
+        df = webdriver_pool.run_with_driver(lambda driver: read_bio_table(driver, url))
+
+    # joins with players ids through the player index (accents, suffixes and punctuation are ignored)
+    # only rows matched to an id are kept
+    df['player_id'] = player_index.match_players(df['Player'], df_ids)
+    df = df[df['player_id'].notna()]
     df = df[['player_id', 'Team', 'Age', 'Height', 'Weight', 'College',
              'Country', 'Draft Year', 'Draft Round','Draft Number']]
     df = df.rename(columns={'Team': 'team', 'Age': 'age', 'Height': 'height', 'Weight': 'weight', 'College': 'college',
                             'Country': 'country', 'Draft Year': 'draft_year', 'Draft Round': 'draft_round',
                             'Draft Number': 'draft_number'})
-    df['height'] = df.apply(lambda x: convert_feet_inches_to_cm(x['height']), axis=1)
-    df['weight'] = df.apply(lambda x: convert_pounds_to_kg(x['weight']), axis=1)
-    return df
+    return normalize_bio_frame(df)
 
 
-def export_players_info(year_start=config.YEAR_START, year_end=config.YEAR_END):
-    create_dfs = True
-    for year in range(year_start, year_end + 1):
+def get_season_players_info(season):
+    """
+    Gets the players details and ids of one season, reusing the files saved by a previous run when the season
+    was completed and its files are unchanged (see run_manifest)
+    :param season: year of the season to get the players information
+    :return: tuple of DataFrames (players details, players ids and names)
+    """
+    unit = f'players_info:{season}'
+    info_path = run_manifest.part_path('players_info', f'players_info_{season}.csv')
+    ids_path = run_manifest.part_path('players_info', f'players_id_{season}.csv')
+    max_age = None if http_cache.season_completed(season) else config.RUN_CURRENT_SEASON_MAX_AGE
+    if run_manifest.is_done(unit, [info_path, ids_path], max_age=max_age):
+        return pd.read_csv(info_path), pd.read_csv(ids_path)
+
+    try:
+        df_ids = get_nba_players_ids(season)
+        df_info = get_nba_players_data(season, df_ids)
+    except Exception as exc:
+        run_manifest.mark_failed(unit, exc)
+        raise
+    df_info.to_csv(info_path, index=None)
+    df_ids.to_csv(ids_path, index=None)
+    run_manifest.mark_done(unit, [info_path, ids_path])
+    return df_info, df_ids
+
+
+def collect_players_info(year_start=config.YEAR_START, year_end=config.YEAR_END):
+    """
+    Scrapes the players details for a range of seasons
+    :param year_start: first season to scrape
+    :param year_end: last season to scrape
+    :return: tuple of DataFrames (players details, players ids and names)
+    """
+    def run_season(year):
         print(f'Starting to run for {year}')
-        if create_dfs:
-            df_ids = get_nba_players_ids(year)
-            df_nba_players_info = get_nba_players_data(year, df_ids)
-            create_dfs = False
-        else:
-            tmp_df_ids = get_nba_players_ids(year)
-            tmp_df_nba_players_info = get_nba_players_data(year, df_ids)
-            df_nba_players_info = pd.concat([df_nba_players_info, tmp_df_nba_players_info])
-            df_ids = pd.concat([df_ids, tmp_df_ids])
-            df_nba_players_info = df_nba_players_info.drop_duplicates('player_id', keep='last')
-            df_ids = df_ids.drop_duplicates('player_id', keep='last')
+        return get_season_players_info(year)
+
+    # seasons are scraped in parallel, one warm driver of the pool each, results are combined in season order
+    try:
+        with ThreadPoolExecutor(max_workers=config.SELENIUM_MAX_DRIVERS) as executor:
+            seasons_info = list(executor.map(run_season, range(year_start, year_end + 1)))
+    finally:
+        webdriver_pool.shutdown_pool()
+
+    return combine_seasons(seasons_info)
+
 
+def combine_seasons(seasons_info):
+    """
+    Combines the players details of several seasons in one concat, the latest season of each player is kept
+    :param seasons_info: list of tuples (players details, players ids and names), in season order
+    :return: tuple of DataFrames (players details, players ids and names)
+    """
+    df_nba_players_info = pd.concat([season_info[0] for season_info in seasons_info], ignore_index=True)
+    df_ids = pd.concat([season_info[1] for season_info in seasons_info], ignore_index=True)
+    df_nba_players_info = df_nba_players_info.drop_duplicates('player_id', keep='last')
+    df_ids = df_ids.drop_duplicates('player_id', keep='last')
+    return df_nba_players_info, df_ids
+
+
+def export_players_info(year_start=config.YEAR_START, year_end=config.YEAR_END):
+    df_nba_players_info, df_ids = collect_players_info(year_start, year_end)
     df_nba_players_info.to_csv('players_info.csv', index=None)
     df_ids.to_csv('players_id.csv', index=None)
 
 
 if __name__ == "__main__":
+    log_config.setup_logging()
     export_players_info()
@@ -1,22 +1,46 @@
 from bs4 import BeautifulSoup
-import requests
+import lxml.html
+from collections import OrderedDict, deque
+from itertools import islice
+import threading
+import time
 import csv
+import pandas as pd
 import config
 import logging
+import http_fetcher
+import log_config
+import columnar_store
+import run_manifest
+import http_cache
 
-# setting log configurations
-logging.basicConfig(filename='nba_web_scrapping.log', encoding='utf-8', level=logging.INFO, format=config.LOG_FORMAT)
+# parsed tables shared between the scrapers, {(year, stat_extension): list_of_dicts}, least recently used first
+_parsed_tables = OrderedDict()
+_parsed_tables_lock = threading.Lock()
 
+# rows of the statistics table, same elements BeautifulSoup finds with class_="full_table"
+FULL_TABLE_XPATH = '//*[contains(concat(" ", normalize-space(@class), " "), " full_table ")]'
 
-def get_html(year, stat_extension):
+# dtypes of the columnar result mode, any other numeric column is stored as float32
+COLUMNAR_STRING_COLS = ['player_id', 'player']
+COLUMNAR_CATEGORY_COLS = ['pos', 'team_id']
+COLUMNAR_SMALL_INT_COLS = {'age': 'Int8', 'g': 'Int16', 'gs': 'Int16'}
+
+
+def get_html(year, stat_extension, backend=None):
     """
     Obtains the html according to the stat_extension and year
     :param year: year the season finished
     :param stat_extension: type of stat(totals, per_game, per_minute, per_poss)
-    :return: html of the table with the statistics
+    :param backend: 'lxml' or 'bs4', defaults to config.HTML_PARSER_BACKEND
+    :return: html of the table with the statistics (lxml elements or BeautifulSoup tags according to the backend)
     """
+    backend = backend or config.HTML_PARSER_BACKEND
+    if backend not in ('lxml', 'bs4'):
+        logging.critical(f'Unknown html parser backend {backend}')
+        raise ValueError(f'Unknown html parser backend {backend}')
     url = ''.join([config.URL_BEG, str(year), stat_extension])
-    response = requests.get(url)
+    response = http_fetcher.fetch(url)
     if response.status_code != 200:
         logging.critical(f'request status {response} for year {year} - NOT SUCCESSFUL!')
     else:
@@ -24,8 +48,12 @@ def get_html(year, stat_extension):
 
     try:
         logging.debug(f'parsing response url {url} for year {year}')
-        soup = BeautifulSoup(response.text, "html.parser")
-        table = soup.find_all(class_="full_table")
+        if backend == 'lxml':
+            document = lxml.html.fromstring(response.text)
+            table = document.xpath(FULL_TABLE_XPATH)
+        else:
+            soup = BeautifulSoup(response.text, "html.parser")
+            table = soup.find_all(class_="full_table")
     except TypeError:
         logging.error(f'request status {response} for year {year} could not be parsed- NOT SUCCESSFUL!')
         raise TypeError("Could not parse request")
@@ -41,12 +69,18 @@ def get_html(year, stat_extension):
         return table
         
 
-def parse_html(response):
+def parse_html(response, table_name='table'):
     """
     Parses the response of an html of table with statistics
     :param response: html of the table
+    :param table_name: name of the table used in the log summary
     :return: a list of dicts where each dict is equivalent to a table row with statistics of a player
     """
+    if len(response) > 0 and isinstance(response[0], lxml.html.HtmlElement):
+        return _parse_html_lxml(response, table_name)
+
+    started = time.perf_counter()
+    row_detail = log_config.row_detail_enabled()
     list_of_dicts = []
     len_response = len(response)
     # iterating over soup object, each row contains one player stats
@@ -73,24 +107,181 @@ def parse_html(response):
                 got_player_data = False
 
         if got_player_data:
-            logging.info(f"data for index {index} out of {len_response} "
-                         f"player {tmp_dict['player']} fetched successfully")
+            if row_detail:
+                logging.debug(f"data for index {index} out of {len_response} "
+                              f"player {tmp_dict['player']} fetched successfully")
+            list_of_dicts.append(tmp_dict)
+    log_config.log_table_summary(table_name, len(list_of_dicts), len_response - len(list_of_dicts), started)
+    return list_of_dicts
+
+
+def _parse_html_lxml(response, table_name='table'):
+    """
+    Parses the rows of a statistics table read with lxml, output is the same as parse_html for BeautifulSoup rows
+    :param response: lxml elements of the table rows
+    :param table_name: name of the table used in the log summary
+    :return: a list of dicts where each dict is equivalent to a table row with statistics of a player
+    """
+    started = time.perf_counter()
+    row_detail = log_config.row_detail_enabled()
+    list_of_dicts = []
+    len_response = len(response)
+    for index, row in enumerate(response):
+        got_player_data = True
+        tmp_dict = {}
+        # creating unique id for each player
+        player_html = row.xpath('.//a/@href')[0]
+        tmp_dict['player_id'] = player_html[:-5].split('/')[-1]
+        cols = row.xpath('.//td')
+        if len(cols) == 0:
+            logging.critical("Table contains no columns")
+            raise TypeError("Could not find columns on html table")
+        for col in cols:
+            try:
+                tmp_dict[col.get("data-stat")] = col.text_content()
+            except Exception as exc:
+                logging.error(f"Could not fetch data on index {index} out of {len_response}"
+                              f" Details of exception: {exc}")
+                got_player_data = False
+
+        if got_player_data:
+            if row_detail:
+                logging.debug(f"data for index {index} out of {len_response} "
+                              f"player {tmp_dict['player']} fetched successfully")
             list_of_dicts.append(tmp_dict)
+    log_config.log_table_summary(table_name, len(list_of_dicts), len_response - len(list_of_dicts), started)
     return list_of_dicts
 
 
+def _row_cells(row):
+    """ Returns the player link and the list of (data-stat, text) cells of a BeautifulSoup or lxml table row """
+    if isinstance(row, lxml.html.HtmlElement):
+        return row.xpath('.//a/@href')[0], [(col.get("data-stat"), col.text_content()) for col in row.xpath('.//td')]
+    return row.find_all("a")[0].get("href"), [(col.get("data-stat"), col.text) for col in row.find_all("td")]
+
+
+def _to_typed_column(name, values):
+    """ Converts a column of strings to its compact dtype """
+    if name in COLUMNAR_STRING_COLS:
+        return pd.Series(values, dtype=object)
+    if name in COLUMNAR_CATEGORY_COLS:
+        return pd.Series(values, dtype='category')
+    numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+    # text columns that are not declared above are kept as categoricals instead of being lost as NaN
+    if numbers.isna().sum() > values.count(''):
+        return pd.Series(values, dtype='category')
+    if name in COLUMNAR_SMALL_INT_COLS:
+        return numbers.astype(COLUMNAR_SMALL_INT_COLS[name])
+    return numbers.astype('float32')
+
+
+def parse_html_columnar(response, table_name='table'):
+    """
+    Parses the response of an html of table with statistics straight into typed columns
+    Rates are float32, games and age small ints, pos and team_id categoricals
+    :param response: html of the table (BeautifulSoup tags or lxml elements)
+    :param table_name: name of the table used in the log summary
+    :return: DataFrame with one row per player, same columns as the dicts returned by parse_html
+    """
+    started = time.perf_counter()
+    columns = {'player_id': []}
+    for index, row in enumerate(response):
+        player_html, cells = _row_cells(row)
+        if len(cells) == 0:
+            logging.critical("Table contains no columns")
+            raise TypeError("Could not find columns on html table")
+        columns['player_id'].append(player_html[:-5].split('/')[-1])
+        for stat, text in cells:
+            columns.setdefault(stat, [''] * index).append(text)
+        # pads the columns that were missing on this row
+        for values in columns.values():
+            if len(values) < index + 1:
+                values.append('')
+
+    df = pd.DataFrame({name: _to_typed_column(name, values) for name, values in columns.items()})
+    log_config.log_table_summary(table_name, len(df), 0, started)
+    return df
+
+
+def log_frame_memory(df, year, stat_extension):
+    """ Logs the number of rows and the memory usage of a typed statistics table """
+    memory = df.memory_usage(deep=True).sum()
+    logging.info(f'Table {stat_extension} for year {year}: {len(df)} rows, {memory / 1024:.1f} KiB in memory')
+
+
+def parse_table(response, year, stat_extension):
+    """
+    Parses the html of a statistics table in the result mode of config.STATS_COLUMNAR
+    :param response: html of the table
+    :param year: year the season finished
+    :param stat_extension: type of stat(totals, per_game, per_minute, per_poss)
+    :return: typed DataFrame in columnar mode (its memory usage is logged), else a list of dicts
+    """
+    table_name = f"{year}{stat_extension.split('.')[0]}"
+    if not config.STATS_COLUMNAR:
+        return parse_html(response, table_name=table_name)
+    df = parse_html_columnar(response, table_name=table_name)
+    log_frame_memory(df, year, stat_extension)
+    return df
+
+
+def remember_parsed_table(year, stat_extension, parsed_table):
+    """
+    Keeps a parsed table in memory so other stages can reuse it without requesting and parsing the page again
+    Only the PARSED_TABLES_MEMO_SIZE most recently used tables are kept
+    :param year: year the season finished
+    :param stat_extension: type of stat(totals, per_game, per_minute, per_poss)
+    :param parsed_table: a list of dicts where each dict is equivalent to a table row with statistics of a player,
+    or the typed DataFrame in columnar mode
+    """
+    with _parsed_tables_lock:
+        _parsed_tables[(year, stat_extension)] = parsed_table
+        _parsed_tables.move_to_end((year, stat_extension))
+        while len(_parsed_tables) > config.PARSED_TABLES_MEMO_SIZE:
+            _parsed_tables.popitem(last=False)
+
+
+def get_parsed_table(year, stat_extension):
+    """
+    Returns the parsed table of a season, from memory if it was already parsed in this process
+    :param year: year the season finished
+    :param stat_extension: type of stat(totals, per_game, per_minute, per_poss)
+    :return: a list of dicts where each dict is equivalent to a table row with statistics of a player,
+    or the typed DataFrame in columnar mode (see parse_table)
+    """
+    with _parsed_tables_lock:
+        parsed_table = _parsed_tables.get((year, stat_extension))
+        if parsed_table is not None:
+            _parsed_tables.move_to_end((year, stat_extension))
+            logging.debug(f'Parsed table for year {year} {stat_extension} reused from memory')
+            return parsed_table
+
+    parsed_table = parse_table(get_html(year, stat_extension), year, stat_extension)
+    remember_parsed_table(year, stat_extension, parsed_table)
+    return parsed_table
+
+
 def export_data_to_csv(year, list_of_dicts, stat_type):
     """
     Saves tables with statistics to a csv file
     :param year: year the season finished
-    :param list_of_dicts: a list of dicts where each dict is equivalent to a table row with statistics of a player
+    :param list_of_dicts: a list of dicts where each dict is equivalent to a table row with statistics of a player,
+    or the typed DataFrame in columnar mode
     :param stat_type: type of stat(totals, per_game, per_minute, per_poss)
+    :return: name of the csv file
     """
     if len(list_of_dicts) == 0 or list_of_dicts is None:
         logging.critical("List of dictionaries contain no data")
         raise TypeError("List of dictionaries contain no data")
 
-    with open(f'sample_{year}{stat_type}.csv', 'w', newline='', encoding='utf-8') as file:
+    started = time.perf_counter()
+    row_detail = log_config.row_detail_enabled()
+    filename = f'sample_{year}{stat_type}.csv'
+    if isinstance(list_of_dicts, pd.DataFrame):
+        list_of_dicts.to_csv(filename, index=False, encoding='utf-8')
+        log_config.log_table_summary(filename, len(list_of_dicts), 0, started, action='saved')
+        return filename
+    with open(filename, 'w', newline='', encoding='utf-8') as file:
         csv_writer = csv.writer(file)
         write_header = True
         for dict_ in list_of_dicts:
@@ -98,34 +289,94 @@ def export_data_to_csv(year, list_of_dicts, stat_type):
                 csv_writer.writerow([key for key in dict_])
                 write_header = False
             csv_writer.writerow([dict_[key] for key in dict_])
-            logging.info(f"data for player {dict_['player']} saved successfully")
+            if row_detail:
+                logging.debug(f"data for player {dict_['player']} saved successfully")
+    log_config.log_table_summary(filename, len(list_of_dicts), 0, started, action='saved')
+    return filename
+
+
+def stats_unit(year, stat_extension):
+    """ Returns the name of the run manifest unit of a season stats table """
+    return f"stats:{year}{stat_extension.split('.')[0]}"
+
+
+def stats_unit_done(year, stat_extension):
+    """ Checks in the run manifest if the csv of a season stats table was already exported and is unchanged """
+    filename = f"sample_{year}{stat_extension.split('.')[0]}.csv"
+    max_age = None if http_cache.season_completed(year) else config.RUN_CURRENT_SEASON_MAX_AGE
+    return run_manifest.is_done(stats_unit(year, stat_extension), [filename], max_age=max_age)
+
+
+def _tables_to_scrape(year_start, year_end, skip):
+    """ Yields the (stat_extension, year) tables to scrape, in the order they are consumed """
+    # type of stats to scrape, totals are consumed last so they are the most recent tables kept in memory
+    # for the players info stage
+    stat_extensions = [config.URL_END_PERGAME, config.URL_END_PER36, config.URL_END_PER100POSS, config.URL_END_TOTALS]
+    for ext in stat_extensions:
+        for year in range(year_start, year_end + 1):
+            if skip is not None and skip(year, ext):
+                continue
+            yield ext, year
+
+
+def iter_players_stats(year_start=config.YEAR_START, year_end=config.YEAR_END, skip=None):
+    """
+    Scrapes players statistics from Basketball Reference for a range of years
+    Pages are requested concurrently, tables are yielded in a deterministic order (stat type, then year)
+    At most FETCH_MAX_WORKERS pages are requested ahead of the consumer, so fetched pages do not pile up in memory
+    Seasons that could not be scraped are reported, recorded as failed in the run manifest and skipped
+    :param year_start: year that the program will start scraping for
+    :param year_end: last year that the program will scrape for
+    :param skip: optional function skip(year, stat_extension), tables for which it returns True are not scraped
+    :return: generator of tuples (year, stat_extension, list_of_dicts), the typed DataFrame replaces the list of
+    dicts when config.STATS_COLUMNAR is True
+    """
+    tables = _tables_to_scrape(year_start, year_end, skip)
+    pending = deque()
+    for ext, year in islice(tables, config.FETCH_MAX_WORKERS):
+        pending.append((ext, year, http_fetcher.submit(get_html, year, ext)))
+
+    while pending:
+        ext, year, future = pending.popleft()
+        print(f'Starting web scrapping for NBA players {ext[1:-5]} year {year}')
+        try:
+            # get url response and parse data table (python list or typed DataFrame, see parse_table)
+            parsed_table = parse_table(future.result(), year, ext)
+            remember_parsed_table(year, ext, parsed_table)
+        except Exception as exc:
+            print('Exception found:', exc)
+            run_manifest.mark_failed(stats_unit(year, ext), exc)
+            continue
+        finally:
+            # the future holds the page document, released before the table is handed to the consumer
+            future = None
+            for next_ext, next_year in islice(tables, 1):
+                pending.append((next_ext, next_year, http_fetcher.submit(get_html, next_year, next_ext)))
+        yield year, ext, parsed_table
 
 
 def export_players_stats(year_start=config.YEAR_START, year_end=config.YEAR_END):
     """
     Export files with players statistics from Basketball Reference to csv according to a range of years
+    Tables already exported by a previous run (recorded in the run manifest with an unchanged csv) are skipped
     :param year_start: year that the program will start scraping for
     :param year_end: last year that the program will scrape for
     """
-    # type of stats to scrape
-    stat_extensions = [config.URL_END_TOTALS, config.URL_END_PERGAME, config.URL_END_PER36, config.URL_END_PER100POSS]
-    # iterating over stat types
-    for ext in stat_extensions:
+    for year, ext, parsed_table in iter_players_stats(year_start, year_end, skip=stats_unit_done):
         stat_type = ext.split('.')[0]
-        # iterating over years
-        for year in range(year_start, year_end + 1):
-            print(f'Starting web scrapping for NBA players {ext[1:-5]} year {year}')
-            try:
-                # get url response
-                html_response = get_html(year, ext)
-                # parse data table into python list
-                parsed_table = parse_html(html_response)
-                # export the data to csv file
-                export_data_to_csv(year, parsed_table, stat_type)
-            except Exception as exc:
-                print('Exception found:', exc)
-            print(f'Web scrapping for NBA players {ext[1:-5]} year {year} completed successfully')
+        try:
+            # export the data to csv file
+            filename = export_data_to_csv(year, parsed_table, stat_type)
+            # export the data to the partitioned columnar dataset
+            if config.DATASET_OUTPUT:
+                columnar_store.write_stats_partition(parsed_table, year, stat_type)
+            run_manifest.mark_done(stats_unit(year, ext), [filename])
+        except Exception as exc:
+            print('Exception found:', exc)
+            run_manifest.mark_failed(stats_unit(year, ext), exc)
+        print(f'Web scrapping for NBA players {ext[1:-5]} year {year} completed successfully')
 
 
 if __name__ == "__main__":
+    log_config.setup_logging()
     export_players_stats()
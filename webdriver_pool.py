@@ -0,0 +1,124 @@
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+import config
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) ' \
+             'Chrome/83.0.4103.116 Safari/537.36'
+
+# warm drivers waiting to be reused
+_idle_drivers = queue.LifoQueue()
+# limits the number of drivers alive at the same time
+_driver_slots = threading.BoundedSemaphore(config.SELENIUM_MAX_DRIVERS)
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def _get_driver_path():
+    """ Returns the path of the chrome driver, installed by ChromeDriverManager only once per process """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+            logging.info(f'Chrome driver installed at {_driver_path}')
+        return _driver_path
+
+
+def _create_driver():
+    """ Starts a new headless chrome """
+    # have to download chrome driver according to your chrome version (https://chromedriver.chromium.org/downloads)
+    try:
+        chrome_options = Options()
+        chrome_options.add_argument("--headless")
+        chrome_options.add_argument(f'user-agent={USER_AGENT}')
+        driver = webdriver.Chrome(_get_driver_path(), options=chrome_options)
+    except Exception as exc:
+        print('ERROR: Could not initialize chrome driver')
+        logging.critical(f'Could not initialize chrome driver, program will be terminated')
+        raise Exception(exc)
+    logging.info('New chrome driver started')
+    return driver
+
+
+def _is_alive(driver):
+    """ Checks if the browser of a driver still answers """
+    try:
+        driver.current_url
+        return True
+    except WebDriverException:
+        return False
+
+
+def _quit(driver):
+    """ Closes a driver, ignoring errors of browsers that already crashed """
+    try:
+        driver.quit()
+    except WebDriverException as exc:
+        logging.warning(f'Could not quit chrome driver, exception {exc}')
+
+
+def _reset(driver):
+    """ Clears the state left by the previous page so the driver can be reused """
+    driver.delete_all_cookies()
+    driver.get('about:blank')
+
+
+@contextmanager
+def driver_session():
+    """
+    Lends a warm driver from the pool, at most SELENIUM_MAX_DRIVERS drivers are in use at the same time
+    Dead drivers are replaced, the driver is reset and returned to the pool after use
+    """
+    with _driver_slots:
+        driver = None
+        while driver is None:
+            try:
+                driver = _idle_drivers.get_nowait()
+            except queue.Empty:
+                driver = _create_driver()
+                break
+            if not _is_alive(driver):
+                logging.warning('Discarding crashed chrome driver from the pool')
+                _quit(driver)
+                driver = None
+
+        try:
+            yield driver
+        finally:
+            try:
+                _reset(driver)
+                _idle_drivers.put(driver)
+            except WebDriverException:
+                logging.warning('Chrome driver crashed, it will be replaced')
+                _quit(driver)
+
+
+def run_with_driver(func, retries=config.SELENIUM_RETRIES):
+    """
+    Runs func(driver) with a driver from the pool, retrying with a new driver if the browser crashed
+    :param func: function receiving a selenium driver
+    :param retries: number of retries after a browser crash
+    :return: result of func
+    """
+    for attempt in range(retries + 1):
+        with driver_session() as driver:
+            try:
+                return func(driver)
+            except Exception as exc:
+                if _is_alive(driver) or attempt == retries:
+                    raise
+                logging.error(f'Chrome driver crashed (attempt {attempt + 1} of {retries + 1}), exception {exc}')
+
+
+def shutdown_pool():
+    """ Closes all the idle drivers """
+    while True:
+        try:
+            _quit(_idle_drivers.get_nowait())
+        except queue.Empty:
+            return